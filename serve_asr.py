@@ -0,0 +1,64 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python serve_asr.py --model=models/soloni-110M-tdt-ctc-v6.nemo \
+#         --port=8000 \
+#         --max_batch_size=32 --max_wait_ms=10
+#
+# Then: curl --data-binary @audio.wav http://127.0.0.1:8000/transcribe
+#       curl http://127.0.0.1:8000/metrics
+#
+# The checkpoint is loaded once and concurrent requests are transcribed together in micro-batches
+# (see utils/asr_server.py). Use --device=cpu to try it without a GPU.
+# `python -m utils.asr_server_smoke --model=<small .nemo>` checks the batching and metrics on CPU.
+import argparse
+import asyncio
+import torch
+# from utils package
+from utils.asr_server import ASRServer, MicroBatcher
+from utils.inference import DECODERS, load_asr_model
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Local ASR server with request micro-batching")
+    parser.add_argument("--model", required=True, type=str, help="Path to the .nemo checkpoint or its safetensors export directory")
+    parser.add_argument("--host", default="127.0.0.1", type=str, help="Address to listen on")
+    parser.add_argument("--port", default=8000, type=int, help="Port to listen on")
+    parser.add_argument("--unix_socket", default=None, type=str, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--decoder", default="default", choices=DECODERS, help="Head used to decode hybrid models")
+    parser.add_argument("--max_batch_size", default=32, type=int, help="Maximum number of requests per batch")
+    parser.add_argument("--max_wait_ms", default=10.0, type=float, help="Latency budget spent collecting a batch")
+    parser.add_argument("--decode_workers", default=4, type=int, help="Number of audio decoding threads")
+    parser.add_argument("--max_duration", default=None, type=float, help="Reject audios longer than this, in seconds")
+    parser.add_argument("--device", default=None, type=str, help="Device to run the model on, e.g. cpu or cuda:0")
+    parser.add_argument("--amp", default=None, choices=["bf16", "fp16"], help="Autocast the forward pass")
+    args = parser.parse_args()
+
+    model = load_asr_model(args.model, device=torch.device(args.device) if args.device else None)
+    batcher = MicroBatcher(
+        model,
+        decoder=args.decoder,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        amp=args.amp,
+    )
+    server = ASRServer(
+        batcher, model.cfg.preprocessor.sample_rate, decode_workers=args.decode_workers, max_duration=args.max_duration
+    )
+
+    try:
+        asyncio.run(server.serve(host=args.host, port=args.port, unix_socket=args.unix_socket))
+    except KeyboardInterrupt:
+        print("Server stopped")
@@ -0,0 +1,35 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+import sys
+# Only lightweight imports here, torch, NeMo and Lightning are imported once the config is validated
+from omegaconf import OmegaConf
+from utils.preflight import PhaseTimer, preflight
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) != 2:
+        raise ValueError("Usage: python train.py <config_path>")
+
+    timer = PhaseTimer()
+    # Load YAML configuration, everything else (model family, warm start, vocabulary...) is driven by it
+    with timer.phase("preflight"):
+        config = OmegaConf.load(sys.argv[1])
+        # Fail on bad paths or unset values before any heavy import, GPU allocation or model download
+        preflight(config)
+
+    with timer.phase("imports"):
+        from utils.training import train
+    train(config, timer=timer)
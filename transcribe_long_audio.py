@@ -0,0 +1,78 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python transcribe_long_audio.py --model=models/soloni-110M-tdt-ctc-v6.nemo \
+#         --audio griot_recording.wav radio_show.flac \
+#         --output=long_predictions.jsonl \
+#         --chunk_len=20 --left_context=5 --right_context=5
+# or
+#       python transcribe_long_audio.py --model=<.nemo> --manifest=<manifest> --output=<jsonl>
+#
+# Long recordings are transcribed chunk by chunk with left/right context (see utils/streaming.py),
+# so memory use doesn't grow with the file length. With --print_partial the text of each chunk is
+# printed as soon as it is decoded.
+import argparse
+import json
+# from utils package
+from utils.inference import DECODERS, load_asr_model
+from utils.streaming import ChunkedTranscriber
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Chunked transcription of long audio files")
+    parser.add_argument("--model", required=True, type=str, help="Path to the .nemo checkpoint or its safetensors export directory")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--audio", nargs="+", type=str, help="Audio files to transcribe")
+    group.add_argument("--manifest", type=str, help="Manifest of the audio files to transcribe")
+    parser.add_argument("--output", required=True, type=str, help="Output JSONL file")
+    parser.add_argument("--decoder", default="default", choices=DECODERS, help="Head used to decode hybrid models")
+    parser.add_argument("--chunk_len", default=20.0, type=float, help="Seconds of audio decoded per chunk")
+    parser.add_argument("--left_context", default=5.0, type=float, help="Seconds of context before each chunk")
+    parser.add_argument("--right_context", default=5.0, type=float, help="Seconds of context after each chunk")
+    parser.add_argument("--amp", default=None, choices=["bf16", "fp16"], help="Autocast the forward pass")
+    parser.add_argument("--print_partial", action="store_true", help="Print the text of each chunk as it is decoded")
+    args = parser.parse_args()
+
+    if args.manifest:
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    else:
+        entries = [{'audio_filepath': path} for path in args.audio]
+
+    model = load_asr_model(args.model)
+    transcriber = ChunkedTranscriber(
+        model,
+        decoder=args.decoder,
+        chunk_len=args.chunk_len,
+        left_context=args.left_context,
+        right_context=args.right_context,
+        amp=args.amp,
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as fout:
+        for entry in entries:
+            audio_path = entry['audio_filepath']
+            on_chunk = None
+            if args.print_partial:
+                on_chunk = lambda text, latency: print(f"[{latency * 1000:.0f} ms] {text}", flush=True)
+            text, stats = transcriber.transcribe(audio_path, on_chunk=on_chunk)
+            fout.write(json.dumps({**entry, 'pred_text': text, **stats}, ensure_ascii=False) + '\n')
+            fout.flush()
+            print(
+                f"{audio_path}: {stats['num_chunks']} chunks, "
+                f"max chunk latency {stats['max_chunk_latency'] * 1000:.0f} ms"
+            )
+
+    print(f"Predictions written to: {args.output}")
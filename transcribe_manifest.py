@@ -0,0 +1,96 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python transcribe_manifest.py --model=models/soloni-110M-tdt-ctc-v6.nemo \
+#         --manifest=bam-asr-all/manifests/test-manifest.json \
+#         --output=predictions.jsonl \
+#         --decoder=<"default", "tdt" or "ctc">
+#
+# Utterances are sorted by duration and packed into batches of at most --batch_duration seconds of
+# padded audio. Audio decoding runs in a DataLoader worker pool while the model transcribes the
+# previous batches. Each manifest entry is written back with its `pred_text` and the `latency` of its
+# batch, and a `<output>.summary.json` file records the throughput (RTFx) of the run.
+import argparse
+import json
+import time
+import torch
+from tqdm import tqdm
+# from utils package
+from utils.feature_cache import AudioDataset, collate_audio
+from utils.inference import DECODERS, duration_batches, load_asr_model, transcribe_batch
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Transcribe a manifest with a fine-tuned .nemo model")
+    parser.add_argument("--model", required=True, type=str, help="Path to the .nemo checkpoint or its safetensors export directory")
+    parser.add_argument("--manifest", required=True, type=str, help="Manifest of the audios to transcribe")
+    parser.add_argument("--output", required=True, type=str, help="Output JSONL file")
+    parser.add_argument("--decoder", default="default", choices=DECODERS, help="Head used to decode hybrid models")
+    parser.add_argument("--batch_duration", default=600.0, type=float, help="Padded seconds of audio per batch")
+    parser.add_argument("--max_batch_size", default=128, type=int, help="Maximum number of utterances per batch")
+    parser.add_argument("--num_workers", default=4, type=int, help="Number of audio loading workers")
+    parser.add_argument("--amp", default=None, choices=["bf16", "fp16"], help="Autocast the forward pass")
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    model = load_asr_model(args.model)
+    sample_rate = model.cfg.preprocessor.sample_rate
+
+    batches = duration_batches([e['duration'] for e in entries], args.batch_duration, args.max_batch_size)
+    loader = torch.utils.data.DataLoader(
+        AudioDataset(entries, sample_rate),
+        batch_sampler=batches,
+        num_workers=args.num_workers,
+        collate_fn=collate_audio,
+        pin_memory=torch.cuda.is_available(),
+        prefetch_factor=4 if args.num_workers > 0 else None,
+    )
+
+    predictions = [None] * len(entries)
+    latencies = [None] * len(entries)
+    start = time.perf_counter()
+    for indices, (signals, lengths) in zip(batches, tqdm(loader, desc="Transcribing")):
+        batch_start = time.perf_counter()
+        texts = transcribe_batch(model, signals, lengths, decoder=args.decoder, amp=args.amp)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        latency = time.perf_counter() - batch_start
+        for i, text in zip(indices, texts):
+            predictions[i] = text
+            latencies[i] = latency
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as fout:
+        for entry, text, latency in zip(entries, predictions, latencies):
+            fout.write(json.dumps({**entry, 'pred_text': text, 'latency': latency}, ensure_ascii=False) + '\n')
+
+    audio_duration = sum(e['duration'] for e in entries)
+    summary = {
+        'model': args.model,
+        'manifest': args.manifest,
+        'decoder': args.decoder,
+        'num_utterances': len(entries),
+        'num_batches': len(batches),
+        'audio_duration': audio_duration,
+        'wall_time': elapsed,
+        'rtfx': audio_duration / elapsed if elapsed else None,
+    }
+    with open(f"{args.output}.summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Transcribed {len(entries)} utterances ({audio_duration / 3600:.2f}h) in {elapsed:.1f}s, RTFx={summary['rtfx']:.1f}")
+    print(f"Predictions written to: {args.output}")
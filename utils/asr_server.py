@@ -0,0 +1,253 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+import asyncio
+import collections
+import io
+import json
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+import torch
+from .inference import transcribe_batch
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+class ServerMetrics:
+    """Counters exposed on GET /metrics, latencies are kept for the last `window` requests."""
+    def __init__(self, window: int = 1000):
+        self.start_time = time.monotonic()
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_batches = 0
+        self.num_retried_batches = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+
+    def as_dict(self, queue_depth: int) -> dict:
+        uptime = time.monotonic() - self.start_time
+        latencies = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "uptime": uptime,
+            "num_requests": self.num_requests,
+            "num_errors": self.num_errors,
+            "num_batches": self.num_batches,
+            "num_retried_batches": self.num_retried_batches,
+            "queue_depth": queue_depth,
+            "requests_per_second": self.num_requests / uptime if uptime else 0.0,
+            "audio_seconds_per_second": self.audio_seconds / uptime if uptime else 0.0,
+            "model_utilization": self.busy_seconds / uptime if uptime else 0.0,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p95": float(np.percentile(latencies, 95)),
+        }
+
+class MicroBatcher:
+    """
+    Collect concurrent transcription requests into batches.
+
+    A batch is started as soon as a request is queued and closed when it holds `max_batch_size` requests or
+    when `max_wait_ms` have passed since its first request, so a lone request waits at most `max_wait_ms`.
+    Batches run one at a time in a dedicated thread, keeping the event loop free to accept requests. If a
+    batch fails, its requests are retried one by one so only the failing ones get the error.
+    """
+    def __init__(self, model, decoder: str = "default", max_batch_size: int = 32, max_wait_ms: float = 10.0,
+                 amp: Optional[str] = None, metrics: Optional[ServerMetrics] = None):
+        self.model = model
+        self.decoder = decoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.amp = amp
+        self.metrics = metrics or ServerMetrics()
+        self.queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def submit(self, signal: np.ndarray) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((signal, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _transcribe(self, signals: List[np.ndarray]) -> List[str]:
+        lengths = torch.tensor([len(s) for s in signals], dtype=torch.long)
+        padded = torch.zeros(len(signals), int(lengths.max()))
+        for i, signal in enumerate(signals):
+            padded[i, :len(signal)] = torch.from_numpy(signal)
+        return transcribe_batch(self.model, padded, lengths, decoder=self.decoder, amp=self.amp)
+
+    def _transcribe_batch_or_each(self, signals: List[np.ndarray]) -> List[Union[str, Exception]]:
+        """Transcribe the batch, or each signal on its own if the batch fails, returning the errors in place."""
+        try:
+            return self._transcribe(signals)
+        except Exception as e:
+            if len(signals) == 1:
+                return [e]
+        self.metrics.num_retried_batches += 1
+        results = []
+        for signal in signals:
+            try:
+                results.append(self._transcribe([signal])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            signals = [signal for signal, _ in batch]
+            start = time.monotonic()
+            try:
+                results = await loop.run_in_executor(self._executor, self._transcribe_batch_or_each, signals)
+            finally:
+                self.metrics.busy_seconds += time.monotonic() - start
+            self.metrics.num_batches += 1
+            self.metrics.batch_sizes.append(len(batch))
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+class ASRServer:
+    """
+    Minimal asyncio HTTP/1.1 server around a `MicroBatcher`.
+
+    Routes:
+        POST /transcribe  body: a WAV/FLAC file -> {"text": ..., "latency": ..., "duration": ...}
+        GET /metrics      throughput, queue depth, batch size and latency percentiles
+        GET /health       {"status": "ok"}
+    """
+    def __init__(self, batcher: MicroBatcher, sample_rate: int, decode_workers: int = 4,
+                 min_duration: float = 0.1, max_duration: Optional[float] = None):
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+        self.sample_rate = sample_rate
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self._decode_executor = ThreadPoolExecutor(max_workers=decode_workers)
+
+    def _decode(self, body: bytes) -> np.ndarray:
+        """Decode and validate a request's audio, before it can join a batch."""
+        audio, sr = sf.read(io.BytesIO(body), dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sr != self.sample_rate:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
+        duration = len(audio) / self.sample_rate
+        if duration < self.min_duration:
+            raise ValueError(f"audio of {duration:.3f}s is shorter than {self.min_duration}s")
+        if self.max_duration is not None and duration > self.max_duration:
+            raise ValueError(f"audio of {duration:.1f}s is longer than {self.max_duration}s")
+        if not np.isfinite(audio).all():
+            raise ValueError("audio has NaN or infinite samples")
+        return audio
+
+    async def _transcribe(self, body: bytes) -> Tuple[int, dict]:
+        start = time.monotonic()
+        try:
+            signal = await asyncio.get_running_loop().run_in_executor(self._decode_executor, self._decode, body)
+        except Exception as e:
+            self.metrics.num_errors += 1
+            return 400, {"error": f"Invalid audio: {e}"}
+        try:
+            text = await self.batcher.submit(signal)
+        except Exception as e:
+            self.metrics.num_errors += 1
+            return 500, {"error": str(e)}
+        latency = time.monotonic() - start
+        duration = len(signal) / self.sample_rate
+        self.metrics.num_requests += 1
+        self.metrics.audio_seconds += duration
+        self.metrics.latencies.append(latency)
+        return 200, {"text": text, "latency": latency, "duration": duration}
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        path = path.split("?", 1)[0]
+        if path == "/transcribe":
+            if method != "POST":
+                return 405, {"error": "Use POST with the audio file as body"}
+            return await self._transcribe(body)
+        if path in ("/metrics", "/health"):
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            if path == "/health":
+                return 200, {"status": "ok"}
+            return 200, self.metrics.as_dict(self.batcher.queue.qsize())
+        return 404, {"error": f"Unknown path {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._route(method, path, body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, unix_socket: Optional[str] = None) -> None:
+        """Serve forever on a TCP port, or on a Unix socket if `unix_socket` is given."""
+        batcher_task = asyncio.create_task(self.batcher.run())
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle, path=unix_socket)
+            print(f"Serving on unix socket {unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+            print(f"Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
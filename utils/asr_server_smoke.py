@@ -0,0 +1,108 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.asr_server_smoke --model=<small .nemo checkpoint, e.g. a QuartzNet> [--audio=<wav>]
+#
+# CPU smoke test of the ASR server: loads the model, starts the server on a free local port, sends
+# `--num_requests` concurrent transcription requests plus one undecodable body, and checks that
+#   - every valid request is answered with a transcript and the invalid one with a 400,
+#   - concurrent requests were grouped in fewer batches than requests,
+#   - GET /metrics reflects the requests, errors and batches.
+# Exits with a non-zero status if a check fails. Without --audio, a few seconds of noise are sent.
+from typing import Tuple
+import argparse
+import asyncio
+import io
+import json
+import sys
+import numpy as np
+import soundfile as sf
+import torch
+from .asr_server import ASRServer, MicroBatcher
+from .inference import load_asr_model
+
+async def http_request(port: int, method: str, path: str, body: bytes = b"") -> Tuple[int, dict]:
+    """One HTTP/1.1 request on a new connection, returns the status and the JSON payload."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).decode("latin-1").split(" ", 2)[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    payload = json.loads(await reader.readexactly(int(headers["content-length"])))
+    writer.close()
+    return status, payload
+
+def _wav_bytes(audio: np.ndarray, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+async def run_smoke_test(server: ASRServer, audio: bytes, num_requests: int) -> bool:
+    batcher_task = asyncio.create_task(server.batcher.run())
+    tcp_server = await asyncio.start_server(server.handle, host="127.0.0.1", port=0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    try:
+        responses = await asyncio.gather(
+            *[http_request(port, "POST", "/transcribe", audio) for _ in range(num_requests)],
+            http_request(port, "POST", "/transcribe", b"not an audio file"),
+        )
+        _, metrics = await http_request(port, "GET", "/metrics")
+    finally:
+        tcp_server.close()
+        batcher_task.cancel()
+
+    checks = {
+        "valid requests transcribed": all(status == 200 and "text" in payload for status, payload in responses[:-1]),
+        "invalid request rejected": responses[-1][0] == 400,
+        "requests batched": 0 < metrics["num_batches"] < num_requests,
+        "metrics count the requests": metrics["num_requests"] == num_requests,
+        "metrics count the errors": metrics["num_errors"] == 1,
+    }
+    print(json.dumps(metrics, indent=2))
+    for name, passed in checks.items():
+        print(f"{'PASS' if passed else 'FAIL'}: {name}")
+    return all(checks.values())
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU smoke test of the ASR server's batching and metrics")
+    parser.add_argument("--model", required=True, type=str, help="Path to a (small) .nemo checkpoint or safetensors export")
+    parser.add_argument("--audio", default=None, type=str, help="Audio file sent by every request, noise if unset")
+    parser.add_argument("--num_requests", default=8, type=int, help="Number of concurrent requests")
+    parser.add_argument("--max_wait_ms", default=200.0, type=float, help="Batching window, large enough to group the requests")
+    args = parser.parse_args()
+
+    model = load_asr_model(args.model, device=torch.device("cpu"))
+    sample_rate = model.cfg.preprocessor.sample_rate
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio = f.read()
+    else:
+        audio = _wav_bytes(np.random.default_rng(0).uniform(-0.1, 0.1, 2 * sample_rate).astype(np.float32), sample_rate)
+
+    batcher = MicroBatcher(model, max_batch_size=args.num_requests, max_wait_ms=args.max_wait_ms)
+    server = ASRServer(batcher, sample_rate, decode_workers=2)
+    if not asyncio.run(run_smoke_test(server, audio, args.num_requests)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import os
+import threading
+import time
+import torch
+from lightning.pytorch.callbacks import Callback
+from lightning.pytorch.plugins import TorchCheckpointIO
+from omegaconf import DictConfig
+
+def _snapshot(obj: Any, buffers: Dict[str, torch.Tensor], pin_memory: bool, key: str = "") -> Any:
+    """
+    Copy the tensors of a checkpoint to host memory, reusing the `buffers` of a previous snapshot (keyed by
+    their position in the checkpoint) when shapes and dtypes match. Containers are copied, other values are
+    kept by reference: Lightning builds them anew for every checkpoint.
+    """
+    if isinstance(obj, torch.Tensor):
+        tensor = obj.detach()
+        buffer = buffers.get(key)
+        if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype:
+            buffer = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=pin_memory and tensor.is_cuda)
+            buffers[key] = buffer
+        # Non-blocking from pinned memory, synchronized once all the tensors are queued
+        buffer.copy_(tensor, non_blocking=tensor.is_cuda)
+        return buffer
+    if isinstance(obj, dict):
+        return type(obj)((k, _snapshot(v, buffers, pin_memory, f"{key}/{k}")) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)) and not hasattr(obj, "_fields"):
+        return type(obj)(_snapshot(v, buffers, pin_memory, f"{key}/{i}") for i, v in enumerate(obj))
+    return obj
+
+class AsyncCheckpointIO(TorchCheckpointIO):
+    """
+    Checkpoint IO plugin writing checkpoints in a background thread.
+
+    `save_checkpoint` only blocks training while the tensors are copied to (pinned) host memory; serialization
+    and disk writes then overlap with training. Files are written next to their target and renamed, so a crash
+    never leaves a truncated checkpoint behind. Writes and removals run in order on a single thread, at most
+    `max_pending` snapshots are held in host memory at a time (a save waits for a free one, which is counted as
+    stall). The time training was blocked and the background write time of every save are kept in `records`.
+    """
+    def __init__(self, max_pending: int = 2, pin_memory: bool = True):
+        super().__init__()
+        self.max_pending = max_pending
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.records: List[Dict[str, Any]] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending: List[Future] = []
+        # Host buffers of the snapshots not being written, reused to avoid pinning memory at every save
+        self._free_buffers: List[Dict[str, torch.Tensor]] = []
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("A background checkpoint write failed") from error
+
+    def _write(self, checkpoint: Dict[str, Any], path: str, buffers: Dict[str, torch.Tensor], record: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            torch.save(checkpoint, tmp_path)
+            os.replace(tmp_path, path)
+            record["bytes"] = os.path.getsize(path)
+        except BaseException as e:
+            self._error = e
+        finally:
+            record["write_seconds"] = time.perf_counter() - start
+            with self._lock:
+                self._free_buffers.append(buffers)
+
+    def save_checkpoint(self, checkpoint: Dict[str, Any], path, storage_options: Optional[Any] = None) -> None:
+        if storage_options is not None:
+            raise TypeError(f"{type(self).__name__} doesn't support storage_options, got {storage_options}")
+        start = time.perf_counter()
+        self._raise_error()
+        self._pending = [future for future in self._pending if not future.done()]
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(0).result()
+        with self._lock:
+            buffers = self._free_buffers.pop() if self._free_buffers else {}
+        snapshot = _snapshot(checkpoint, buffers, self.pin_memory)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        record = {"path": str(path), "stall_seconds": time.perf_counter() - start}
+        self.records.append(record)
+        self._pending.append(self._executor.submit(self._write, snapshot, str(path), buffers, record))
+
+    def remove_checkpoint(self, path) -> None:
+        # Queued after the pending writes, which may include this very file
+        self._pending.append(self._executor.submit(super().remove_checkpoint, path))
+
+    def wait(self) -> None:
+        """Block until every queued write is on disk."""
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        self._raise_error()
+
+    def load_checkpoint(self, path, map_location: Optional[Any] = None, weights_only: Optional[bool] = None) -> Dict[str, Any]:
+        self.wait()
+        if weights_only is None:
+            return super().load_checkpoint(path, map_location=map_location)
+        return super().load_checkpoint(path, map_location=map_location, weights_only=weights_only)
+
+    def summary(self) -> Dict[str, float]:
+        written = [record for record in self.records if "write_seconds" in record]
+        return {
+            "num_checkpoints": len(self.records),
+            "stall_seconds": sum(record["stall_seconds"] for record in self.records),
+            "write_seconds": sum(record["write_seconds"] for record in written),
+            "bytes": sum(record.get("bytes", 0) for record in written),
+        }
+
+    def teardown(self) -> None:
+        self.wait()
+        self._free_buffers = []
+        summary = self.summary()
+        if summary["num_checkpoints"]:
+            print(
+                f"{summary['num_checkpoints']} checkpoints written in the background: training blocked "
+                f"{summary['stall_seconds']:.2f}s, writes took {summary['write_seconds']:.2f}s"
+            )
+
+class CheckpointStallLogger(Callback):
+    """Log the stall and write time of the checkpoints saved since the last epoch to the trainer's logger."""
+    def __init__(self, checkpoint_io: AsyncCheckpointIO):
+        self.checkpoint_io = checkpoint_io
+        self._logged = 0
+
+    def on_train_epoch_end(self, trainer, pl_module) -> None:
+        records = self.checkpoint_io.records[self._logged:]
+        if not records or trainer.logger is None or not trainer.is_global_zero:
+            return
+        self._logged += len(records)
+        metrics = {"checkpoint/stall_seconds": sum(record["stall_seconds"] for record in records)}
+        written = [record for record in records if "write_seconds" in record]
+        if written:
+            metrics["checkpoint/write_seconds"] = sum(record["write_seconds"] for record in written)
+        trainer.logger.log_metrics(metrics, step=trainer.global_step)
+
+def async_checkpoint_plugins(training_config: DictConfig):
+    """
+    Checkpoint IO plugin and metrics callback from the `training.async_checkpoint` section of the config:
+
+        async_checkpoint:
+          enabled: True
+          max_pending: 2      # snapshots held in host memory while being written
+          save_model: True    # also package the final .nemo in the background, see `save_model_async`
+
+    Returns `(None, None)` when disabled.
+    """
+    async_config = training_config.get("async_checkpoint", None)
+    if async_config is None or not async_config.get("enabled", False):
+        return None, None
+    if training_config.get("strategy", "auto") == "fsdp":
+        raise ValueError("training.async_checkpoint doesn't support the fsdp strategy, its checkpoints are sharded")
+    checkpoint_io = AsyncCheckpointIO(max_pending=async_config.get("max_pending", 2))
+    return checkpoint_io, CheckpointStallLogger(checkpoint_io)
+
+def save_model_async(model, save_path: str) -> Future:
+    """
+    Package the model to `save_path` (`model.save_to`) in a background thread and return its future, so testing
+    can run in the meantime. The model must not be modified until the future is done; the archive is written
+    to a temporary name and renamed once complete.
+    """
+    def _save():
+        start = time.perf_counter()
+        directory, name = os.path.split(os.path.abspath(save_path))
+        os.makedirs(directory, exist_ok=True)
+        # Keeps the .nemo extension
+        tmp_path = os.path.join(directory, f".tmp-{name}")
+        model.save_to(tmp_path)
+        os.replace(tmp_path, save_path)
+        return time.perf_counter() - start
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="save-model")
+    future = executor.submit(_save)
+    executor.shutdown(wait=False)
+    return future
@@ -0,0 +1,109 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+import sqlite3
+
+# Number of bytes hashed at the start and at the end of each file for the content fingerprint
+_FINGERPRINT_BLOCK = 1 << 16
+
+def audio_fingerprint(file_path: str) -> str:
+    """Cheap content fingerprint: blake2b of the file size, its first and its last 64KB."""
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, "rb") as f:
+        digest.update(f.read(_FINGERPRINT_BLOCK))
+        if size > 2 * _FINGERPRINT_BLOCK:
+            f.seek(-_FINGERPRINT_BLOCK, os.SEEK_END)
+            digest.update(f.read(_FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+def default_cache_path(manifest_path: str) -> str:
+    """The cache lives next to the manifest, e.g. train-manifest.json -> train-manifest.audio_meta.sqlite"""
+    return os.path.splitext(manifest_path)[0] + ".audio_meta.sqlite"
+
+class AudioMetadataCache:
+    """
+    On-disk SQLite cache of per-file audio metadata.
+
+    Each entry records channels, sample rate, frame count, duration and a content fingerprint for an
+    `audio_filepath`. An entry is only returned while the file's size and mtime are unchanged, so edited or
+    replaced audios are rescanned automatically.
+    """
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS audio ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, channels INTEGER, "
+        "sample_rate INTEGER, num_frames INTEGER, duration REAL, fingerprint TEXT)"
+    )
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._conn = sqlite3.connect(cache_path)
+        self._conn.execute(self._SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def stat(file_path: str) -> Optional[tuple]:
+        """Return the (size, mtime_ns) key used to validate entries, None if the file is missing."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def get_many(self, file_paths: Iterable[str]) -> Dict[str, dict]:
+        """Return the still-valid entries among `file_paths`, keyed by path."""
+        rows = {
+            row[0]: row for row in self._conn.execute(
+                "SELECT path, size, mtime_ns, channels, sample_rate, num_frames, duration, fingerprint FROM audio"
+            )
+        }
+        valid = {}
+        for path in file_paths:
+            row = rows.get(path)
+            if row is None or self.stat(path) != (row[1], row[2]):
+                continue
+            valid[path] = {
+                "channels": row[3],
+                "sample_rate": row[4],
+                "num_frames": row[5],
+                "duration": row[6],
+                "fingerprint": row[7],
+            }
+        return valid
+
+    def put_many(self, entries: Iterable[dict]) -> None:
+        """Insert or refresh entries; each needs path, size, mtime_ns, channels, sample_rate, num_frames and fingerprint."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO audio VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    e["path"], e["size"], e["mtime_ns"], e["channels"], e["sample_rate"], e["num_frames"],
+                    e["num_frames"] / e["sample_rate"] if e["sample_rate"] else 0.0, e["fingerprint"],
+                )
+                for e in entries
+            ),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
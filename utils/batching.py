@@ -0,0 +1,134 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Dict, List
+import random
+from omegaconf import DictConfig, ListConfig, open_dict
+from .manifest import Manifest
+
+def _manifest_paths(manifest_filepath) -> List[str]:
+    """Flatten a manifest_filepath setting (str, comma separated str or nested list of buckets) to paths."""
+    if isinstance(manifest_filepath, str):
+        return [path for path in manifest_filepath.split(",") if path]
+    paths = []
+    for item in manifest_filepath:
+        paths.extend(_manifest_paths(item))
+    return paths
+
+def read_durations(loader_config: DictConfig) -> List[float]:
+    """Read the durations of a data loader's manifests, keeping only the ones within min/max_duration."""
+    min_duration = loader_config.get("min_duration", None)
+    max_duration = loader_config.get("max_duration", None)
+    manifest_filepath = loader_config.manifest_filepath
+    if isinstance(manifest_filepath, ListConfig):
+        manifest_filepath = list(manifest_filepath)
+    durations = []
+    for path in _manifest_paths(manifest_filepath):
+        # Read from the manifest's duration column, the JSON lines are only parsed when the index is built
+        durations.extend(Manifest(path).filter_duration(min_duration, max_duration).durations.tolist())
+    return durations
+
+def _padding_ratio(batches: List[List[float]]) -> float:
+    """Fraction of the padded batch tensors that is padding."""
+    padded = sum(max(batch) * len(batch) for batch in batches)
+    return 1.0 - sum(sum(batch) for batch in batches) / padded if padded else 0.0
+
+def padding_report(
+    durations: List[float], batch_size: int, batch_duration: float, num_buckets: int, seed: int = 0
+) -> Dict[str, float]:
+    """
+    Estimate the padding ratio of shuffled fixed-size batches vs. duration-bucketed dynamic batches.
+
+    The dynamic batches are simulated like lhotse's DynamicBucketingSampler: utterances are split into
+    `num_buckets` duration quantiles, shuffled within their bucket and packed until `batch_duration` seconds.
+    """
+    rng = random.Random(seed)
+    shuffled = list(durations)
+    rng.shuffle(shuffled)
+    fixed = [shuffled[i:i + batch_size] for i in range(0, len(shuffled), batch_size)]
+
+    ordered = sorted(durations)
+    bucket_len = max(1, -(-len(ordered) // num_buckets))
+    dynamic = []
+    for start in range(0, len(ordered), bucket_len):
+        bucket = ordered[start:start + bucket_len]
+        rng.shuffle(bucket)
+        batch, total = [], 0.0
+        for duration in bucket:
+            if batch and total + duration > batch_duration:
+                dynamic.append(batch)
+                batch, total = [], 0.0
+            batch.append(duration)
+            total += duration
+        if batch:
+            dynamic.append(batch)
+
+    return {
+        "fixed_padding_ratio": _padding_ratio(fixed),
+        "fixed_num_batches": len(fixed),
+        "dynamic_padding_ratio": _padding_ratio(dynamic),
+        "dynamic_num_batches": len(dynamic),
+    }
+
+def apply_dynamic_batching(loader_config: DictConfig, report: bool = True) -> DictConfig:
+    """
+    Switch a data loader section of the YAML config to duration-based dynamic batching.
+
+    Does nothing unless the section has a `dynamic_batching` sub-section, e.g.:
+
+        dynamic_batching:
+          batch_duration: 600   # seconds of audio per batch
+          num_buckets: 30
+          max_batch_size: 128   # optional cap on the number of utterances per batch
+
+    The section is translated to NeMo's lhotse data loading options (`use_lhotse`, `batch_duration`,
+    `num_buckets`...), which `setup_training_data`/`setup_validation_data` consume directly. With
+    `report=True` the padding ratio of the fixed `batch_size` and of the dynamic batches is printed.
+    """
+    dynamic_batching = loader_config.get("dynamic_batching", None)
+    if dynamic_batching is None:
+        return loader_config
+
+    batch_duration = dynamic_batching.batch_duration
+    num_buckets = dynamic_batching.get("num_buckets", 30)
+
+    if report:
+        durations = read_durations(loader_config)
+        if durations:
+            stats = padding_report(durations, loader_config.batch_size, batch_duration, num_buckets)
+            print(
+                f"Padding ratio for {loader_config.manifest_filepath}: "
+                f"{stats['fixed_padding_ratio']:.1%} with batch_size={loader_config.batch_size} "
+                f"({stats['fixed_num_batches']} batches) -> {stats['dynamic_padding_ratio']:.1%} with "
+                f"batch_duration={batch_duration}s ({stats['dynamic_num_batches']} batches)"
+            )
+
+    with open_dict(loader_config):
+        loader_config.pop("dynamic_batching")
+        loader_config.use_lhotse = True
+        loader_config.use_bucketing = True
+        loader_config.batch_duration = batch_duration
+        loader_config.num_buckets = num_buckets
+        loader_config.batch_size = dynamic_batching.get("max_batch_size", None)
+        loader_config.quadratic_duration = dynamic_batching.get("quadratic_duration", None)
+        loader_config.bucket_buffer_size = dynamic_batching.get("bucket_buffer_size", 10000)
+        loader_config.shuffle_buffer_size = dynamic_batching.get("shuffle_buffer_size", 10000)
+    return loader_config
+
+def uses_dynamic_batching(data_loaders_config: DictConfig) -> bool:
+    """Whether any data loader of the config is set up for dynamic batching."""
+    return any(
+        loader_config.get("dynamic_batching", None) is not None or loader_config.get("use_lhotse", False)
+        for loader_config in data_loaders_config.values()
+    )
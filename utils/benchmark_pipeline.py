@@ -0,0 +1,252 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.benchmark_pipeline --config=configs/parakeet-110m-config-v6.yaml \
+#         [--manifest=<manifest, defaults to the train manifest of the config>] \
+#         --num_samples=512 --workers=0,2,4,8 --output=benchmark.json
+#
+# Measures the throughput of each stage of the audio input pipeline on a sample of a manifest, in samples/s
+# and audio seconds/s: file open (raw read), decode with soundfile, pydub and librosa, resampling to the
+# configured sample rate, log-mel feature extraction and batch collation, each in a single process. The
+# end-to-end pipeline is then run through a torch DataLoader for each worker count, with the batch size of the
+# config. Compare `audio_seconds_per_second` with the training speed to tell whether a run is input-bound.
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+import torch
+from omegaconf import OmegaConf
+from pydub import AudioSegment
+from .feature_cache import collate_audio
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def decode_soundfile(path: str):
+    audio, sr = sf.read(path, dtype="float32", always_2d=True)
+    return audio.mean(axis=1), sr
+
+def decode_pydub(path: str):
+    audio = AudioSegment.from_file(path)
+    samples = np.asarray(audio.get_array_of_samples(), dtype=np.float32) / (1 << (8 * audio.sample_width - 1))
+    return samples.reshape(-1, audio.channels).mean(axis=1), audio.frame_rate
+
+def decode_librosa(path: str):
+    return librosa.load(path, sr=None, mono=True)
+
+DECODERS = {"soundfile": decode_soundfile, "pydub": decode_pydub, "librosa": decode_librosa}
+
+def decode_any(path: str):
+    """Decode with the first of `DECODERS` able to read the file, or return None if none can."""
+    for decoder in DECODERS.values():
+        try:
+            return decoder(path)
+        except Exception:
+            continue
+    return None
+
+def log_mel(audio: np.ndarray, sample_rate: int, n_mels: int = 80) -> np.ndarray:
+    """Log-mel features with the 25ms window and 10ms hop of the NeMo preprocessors."""
+    mel = librosa.feature.melspectrogram(
+        y=audio, sr=sample_rate, n_fft=512, win_length=int(0.025 * sample_rate),
+        hop_length=int(0.01 * sample_rate), n_mels=n_mels,
+    )
+    return np.log(mel + 2 ** -24)
+
+def _time_stage(name: str, fn: Callable, items: List, durations: List[float]) -> Dict[str, float]:
+    """Run `fn` over `items` once and report its throughput."""
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    return {
+        "stage": name,
+        "num_samples": len(items),
+        "seconds": elapsed,
+        "samples_per_second": len(items) / elapsed if elapsed else float("inf"),
+        "audio_seconds_per_second": sum(durations) / elapsed if elapsed else float("inf"),
+    }
+
+class PipelineDataset(torch.utils.data.Dataset):
+    """The full per-sample pipeline: decode, downmix, resample and (optionally) log-mel features."""
+    def __init__(self, paths: List[str], sample_rate: int, decoder: str = "soundfile", n_mels: int = 0):
+        self.paths = paths
+        self.sample_rate = sample_rate
+        self.decoder = decoder
+        self.n_mels = n_mels
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        audio, sr = DECODERS[self.decoder](self.paths[idx])
+        if sr != self.sample_rate:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
+        if self.n_mels:
+            log_mel(audio, self.sample_rate, self.n_mels)
+        return torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+
+def benchmark_stages(entries: List[dict], sample_rate: int, n_mels: int, batch_size: int) -> List[Dict[str, float]]:
+    """
+    Single-process throughput of every stage, each one timed on the outputs of the previous one.
+
+    A decoder failing on a file is reported as an error of its stage. The resample, features and collate stages
+    run on the files decoded by the first decoder able to read them, the files no decoder can read are skipped
+    and listed in the `skipped_files` of the resample stage.
+    """
+    paths = [entry["audio_filepath"] for entry in entries]
+    durations = [entry["duration"] for entry in entries]
+    results = [_time_stage("open", _read_bytes, paths, durations)]
+    for name, decoder in DECODERS.items():
+        try:
+            results.append(_time_stage(f"decode_{name}", decoder, paths, durations))
+        except Exception as e:
+            results.append({"stage": f"decode_{name}", "error": str(e)})
+
+    # The later stages run on the files at least one decoder can read, the others are reported and skipped
+    decoded, kept, skipped = [], [], []
+    for path, duration in zip(paths, durations):
+        item = decode_any(path)
+        if item is None:
+            skipped.append(path)
+        else:
+            decoded.append(item)
+            kept.append(duration)
+    if skipped:
+        print(f"Skipping {len(skipped)} files no decoder can read in the later stages, e.g. {skipped[0]}")
+    if not decoded:
+        results.append({"stage": "resample", "error": "no file could be decoded", "skipped_files": skipped})
+        return results
+    durations = kept
+
+    results.append(_time_stage(
+        "resample",
+        lambda item: librosa.resample(item[0], orig_sr=item[1], target_sr=sample_rate) if item[1] != sample_rate else item[0],
+        decoded, durations,
+    ))
+    resampled = [
+        librosa.resample(audio, orig_sr=sr, target_sr=sample_rate) if sr != sample_rate else audio for audio, sr in decoded
+    ]
+    results[-1]["num_resampled"] = sum(1 for _, sr in decoded if sr != sample_rate)
+    results[-1]["skipped_files"] = skipped
+    results.append(_time_stage("features", lambda audio: log_mel(audio, sample_rate, n_mels), resampled, durations))
+
+    tensors = [torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)) for audio in resampled]
+    batches = [tensors[i:i + batch_size] for i in range(0, len(tensors), batch_size)]
+    batch_durations = [sum(durations[i:i + batch_size]) for i in range(0, len(durations), batch_size)]
+    results.append(_time_stage("collate", collate_audio, batches, batch_durations))
+    results[-1]["batch_size"] = batch_size
+    return results
+
+def benchmark_workers(
+    entries: List[dict], sample_rate: int, n_mels: int, batch_size: int, workers: List[int], decoder: str = "soundfile"
+) -> List[Dict[str, float]]:
+    """End-to-end DataLoader throughput for each worker count, including the worker start-up time."""
+    paths = [entry["audio_filepath"] for entry in entries]
+    total_duration = sum(entry["duration"] for entry in entries)
+    results = []
+    for num_workers in workers:
+        loader = torch.utils.data.DataLoader(
+            PipelineDataset(paths, sample_rate, decoder=decoder, n_mels=n_mels),
+            batch_size=batch_size, num_workers=num_workers, collate_fn=collate_audio,
+        )
+        start = time.perf_counter()
+        first_batch = None
+        for _ in loader:
+            if first_batch is None:
+                first_batch = time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        results.append({
+            "num_workers": num_workers,
+            "decoder": decoder,
+            "seconds": elapsed,
+            "first_batch_seconds": first_batch,
+            "samples_per_second": len(paths) / elapsed,
+            "audio_seconds_per_second": total_duration / elapsed,
+        })
+        print(
+            f"num_workers={num_workers:<3} {results[-1]['samples_per_second']:8.1f} samples/s "
+            f"{results[-1]['audio_seconds_per_second']:9.1f} audio s/s (first batch {first_batch:.2f}s)"
+        )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the throughput of the audio input pipeline")
+    parser.add_argument("--config", default=None, type=str, help="Training YAML config providing the manifest, sample rate and batch size")
+    parser.add_argument("--manifest", default=None, type=str, help="Manifest to sample, defaults to the train manifest of the config")
+    parser.add_argument("--loader", default="train", type=str, help="Data loader section of the config to read")
+    parser.add_argument("--num_samples", default=512, type=int, help="Number of utterances benchmarked")
+    parser.add_argument("--workers", default="0,2,4,8", type=str, help="Comma separated DataLoader worker counts")
+    parser.add_argument("--decoder", default="soundfile", choices=list(DECODERS), help="Decoder used in the DataLoader runs")
+    parser.add_argument("--sample_rate", default=None, type=int, help="Target sample rate, defaults to the config's or 16000")
+    parser.add_argument("--batch_size", default=None, type=int, help="Batch size, defaults to the config's or 32")
+    parser.add_argument("--n_mels", default=80, type=int, help="Number of mel bands (80 for Parakeet, 64 for QuartzNet)")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the utterance sample")
+    parser.add_argument("--output", default="benchmark.json", type=str, help="JSON report path")
+    args = parser.parse_args()
+
+    loader_config = OmegaConf.load(args.config).data_loaders[args.loader] if args.config else OmegaConf.create({})
+    manifest = args.manifest or loader_config.get("manifest_filepath", None)
+    if not manifest:
+        parser.error("--manifest or --config is required")
+    sample_rate = args.sample_rate or loader_config.get("sample_rate", 16000)
+    batch_size = args.batch_size or loader_config.get("batch_size", None) or 32
+
+    with open(manifest, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries = random.Random(args.seed).sample(entries, min(args.num_samples, len(entries)))
+    workers = [int(w) for w in args.workers.split(",")]
+
+    stages = benchmark_stages(entries, sample_rate, args.n_mels, batch_size)
+    for stage in stages:
+        if "error" in stage:
+            print(f"{stage['stage']:<18} failed: {stage['error']}")
+        else:
+            print(f"{stage['stage']:<18} {stage['samples_per_second']:10.1f} samples/s {stage['audio_seconds_per_second']:10.1f} audio s/s")
+    loaders = benchmark_workers(entries, sample_rate, args.n_mels, batch_size, workers, decoder=args.decoder)
+
+    report = {
+        "manifest": os.path.abspath(manifest),
+        "config": args.config,
+        "num_samples": len(entries),
+        "audio_seconds": sum(entry["duration"] for entry in entries),
+        "sample_rate": sample_rate,
+        "batch_size": batch_size,
+        "n_mels": args.n_mels,
+        "seed": args.seed,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "hostname": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "librosa": librosa.__version__,
+            "soundfile": sf.__version__,
+        },
+        "stages": stages,
+        "data_loader": loaders,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
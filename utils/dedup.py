@@ -0,0 +1,201 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.dedup --train=bam-asr-all/manifests/train-manifest.json \
+#         --valid=<valid manifests> --test=bam-asr-all/manifests/test-manifest.json \
+#         --output_dir="<output directory>"
+# or
+#       python -m utils.dedup --config=configs/parakeet-110m-config-v6.yaml --output_dir="<output directory>"
+#
+# Fingerprints the decoded PCM of every audio in a process pool, and the normalized transcripts, then
+# reports the duplicates within each manifest and across the train/valid/test splits. A clip is kept in
+# the first split it appears in, test first, then valid, then train, so test clips are never removed and
+# leaked clips are dropped from training. The deduplicated manifests and `dedup_report.json` are written
+# to the output directory. Transcript overlap across splits is reported, and only removed from the lower
+# priority split with --drop_text_leaks (short phrases are legitimately shared by different speakers).
+# Each output manifest is named after its source with a hash of the source path, listed in the report.
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import soundfile as sf
+from omegaconf import OmegaConf
+from pydub import AudioSegment
+from .evaluate import normalize_text
+
+# Splits in the order clips are claimed: a clip found in several splits stays in the first one
+SPLITS = ("test", "valid", "train")
+
+def pcm_fingerprint(audio_path: str) -> Tuple[str, Optional[str]]:
+    """
+    Worker: digest of the decoded 16-bit mono PCM and sample rate of an audio, with leading and trailing digital
+    silence trimmed, so the same clip matches whatever its container, channel layout or padding.
+
+    Returns:
+        tuple: (audio_path, hex digest), the digest is None if the file couldn't be decoded.
+    """
+    try:
+        try:
+            pcm, sample_rate = sf.read(audio_path, dtype="int16", always_2d=True)
+        except RuntimeError:
+            # Not a libsndfile format (e.g. mp3/m4a)
+            audio = AudioSegment.from_file(audio_path).set_sample_width(2)
+            pcm = np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, audio.channels)
+            sample_rate = audio.frame_rate
+        if pcm.shape[1] > 1:
+            pcm = pcm.astype(np.int32).mean(axis=1).astype(np.int16)
+        else:
+            pcm = pcm[:, 0]
+        nonzero = np.flatnonzero(pcm)
+        pcm = pcm[nonzero[0]:nonzero[-1] + 1] if len(nonzero) else pcm[:0]
+        digest = hashlib.blake2b(str(sample_rate).encode(), digest_size=16)
+        digest.update(np.ascontiguousarray(pcm).tobytes())
+        return audio_path, digest.hexdigest()
+    except Exception:
+        return audio_path, None
+
+def text_fingerprint(text: str) -> str:
+    """Digest of the lowercased transcript without punctuation and extra whitespace."""
+    return hashlib.blake2b(normalize_text(text, True, True).encode(), digest_size=16).hexdigest()
+
+def output_manifest_path(manifest_path: str, output_dir: str) -> str:
+    """Deduplicated manifest location, keyed by the source path: `a/train.json` and `b/train.json` don't collide."""
+    digest = hashlib.sha1(os.path.abspath(manifest_path).encode()).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(manifest_path))[0]
+    return os.path.join(output_dir, f"{name}-{digest}.json")
+
+def _read_lines(manifest_path: str) -> List[str]:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return [line if line.endswith("\n") else line + "\n" for line in f if line.strip()]
+
+def deduplicate(
+    manifests: List[Tuple[str, str]],
+    output_dir: str,
+    drop_text_leaks: bool = False,
+    num_workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Dict:
+    """
+    Remove duplicated clips from (split, manifest path) pairs and write the kept lines to `output_dir`.
+
+    Manifests are processed in the order of `SPLITS`. An entry is dropped if its audio fingerprint was already
+    seen, in the same manifest (within duplicate) or in an earlier one (cross-split leak). A manifest given
+    for several splits, like a test manifest also used for validation, is processed once and reported.
+
+    Returns:
+        dict: The report, with per-manifest counts and the undecodable audios.
+    """
+    order = {split: i for i, split in enumerate(SPLITS)}
+    splits_of = {}
+    for split, path in sorted(manifests, key=lambda item: order[item[0]]):
+        splits_of.setdefault(path, []).append(split)
+
+    lines = {path: _read_lines(path) for path in splits_of}
+    entries = {path: [json.loads(line) for line in path_lines] for path, path_lines in lines.items()}
+    audio_paths = list(dict.fromkeys(e["audio_filepath"] for path_entries in entries.values() for e in path_entries))
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers > 1 and len(audio_paths) > chunksize:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            audio_fps = dict(executor.map(pcm_fingerprint, audio_paths, chunksize=chunksize))
+    else:
+        audio_fps = dict(map(pcm_fingerprint, audio_paths))
+
+    report = {
+        "shared_manifests": {path: splits for path, splits in splits_of.items() if len(splits) > 1},
+        "undecodable": [path for path, fp in audio_fps.items() if fp is None],
+        "manifests": {},
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    audio_owner, text_owner = {}, {}
+    for path in splits_of:
+        stats = {
+            "splits": splits_of[path], "num_entries": len(lines[path]), "num_kept": 0,
+            "audio_duplicates_within": 0, "audio_duplicates_across": {}, "text_overlap_across": {},
+            "dropped_hours": 0.0,
+        }
+        kept = []
+        text_keys = set()
+        for line, entry in zip(lines[path], entries[path]):
+            audio_fp = audio_fps[entry["audio_filepath"]]
+            text_fp = text_fingerprint(entry["text"])
+            audio_source = audio_owner.get(audio_fp) if audio_fp is not None else None
+            text_source = text_owner.get(text_fp)
+            drop = False
+            if audio_source == path:
+                stats["audio_duplicates_within"] += 1
+                drop = True
+            elif audio_source is not None:
+                stats["audio_duplicates_across"][audio_source] = stats["audio_duplicates_across"].get(audio_source, 0) + 1
+                drop = True
+            if text_source is not None and text_source != path:
+                stats["text_overlap_across"][text_source] = stats["text_overlap_across"].get(text_source, 0) + 1
+                drop = drop or drop_text_leaks
+            if drop:
+                stats["dropped_hours"] += entry.get("duration", 0.0) / 3600
+                continue
+            kept.append(line)
+            if audio_fp is not None:
+                audio_owner[audio_fp] = path
+            text_keys.add(text_fp)
+        # Registered after the pass, transcripts repeated within a manifest are not duplicates
+        for text_fp in text_keys:
+            text_owner.setdefault(text_fp, path)
+
+        stats["output_manifest"] = output_manifest_path(path, output_dir)
+        with open(stats["output_manifest"], "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        stats["num_kept"] = len(kept)
+        report["manifests"][path] = stats
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate manifests and check train/valid/test leakage")
+    parser.add_argument("--config", default=None, type=str, help="Training YAML config to read the manifests from")
+    parser.add_argument("--train", default=None, type=str, help="Comma separated list of train manifests")
+    parser.add_argument("--valid", default=None, type=str, help="Comma separated list of validation manifests")
+    parser.add_argument("--test", default=None, type=str, help="Comma separated list of test manifests")
+    parser.add_argument("--output_dir", required=True, type=str, help="Output directory")
+    parser.add_argument("--drop_text_leaks", action="store_true", help="Also drop entries whose transcript is in an earlier split")
+    parser.add_argument("--num_workers", default=None, type=int, help="Number of processes decoding audios")
+    args = parser.parse_args()
+
+    paths = {"train": args.train, "valid": args.valid, "test": args.test}
+    if args.config is not None:
+        config = OmegaConf.load(args.config)
+        for split in SPLITS:
+            paths[split] = paths[split] or config.data_loaders[split].get("manifest_filepath", None)
+    manifests = [(split, path) for split in SPLITS if paths[split] for path in paths[split].split(",")]
+    if not manifests:
+        parser.error("--config or at least one of --train, --valid and --test is required")
+
+    report = deduplicate(manifests, args.output_dir, drop_text_leaks=args.drop_text_leaks, num_workers=args.num_workers)
+    with open(os.path.join(args.output_dir, "dedup_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for path, splits in report["shared_manifests"].items():
+        print(f"WARNING: {path} is used for {' and '.join(splits)}")
+    for path, stats in report["manifests"].items():
+        leaks = sum(stats["audio_duplicates_across"].values())
+        print(
+            f"{path} -> {stats['output_manifest']}: kept {stats['num_kept']}/{stats['num_entries']} ({stats['audio_duplicates_within']} duplicates, "
+            f"{leaks} clips leaked from other splits, {sum(stats['text_overlap_across'].values())} shared transcripts)"
+        )
+    if report["undecodable"]:
+        print(f"{len(report['undecodable'])} audios couldn't be decoded, see dedup_report.json")
+
+if __name__ == "__main__":
+    main()
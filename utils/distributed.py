@@ -0,0 +1,133 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict
+import os
+import torch
+import torch.distributed as dist
+from omegaconf import DictConfig, ListConfig
+
+def global_rank() -> int:
+    """
+    Rank of this process before Lightning sets up the process group.
+
+    `RANK` is set by torchrun, `SLURM_PROCID` by srun. Processes spawned by Lightning's own launcher only get
+    `NODE_RANK` and `LOCAL_RANK`, the original process (rank 0) having none of these variables.
+    """
+    for variable in ("RANK", "SLURM_PROCID"):
+        if variable in os.environ:
+            return int(os.environ[variable])
+    local_rank = int(os.environ.get("LOCAL_RANK", 0))
+    if local_rank or int(os.environ.get("NODE_RANK", 0)):
+        # Only used to tell rank 0 apart, the exact value doesn't matter
+        return int(os.environ.get("NODE_RANK", 0)) * 1024 + local_rank
+    return 0
+
+def is_global_zero() -> bool:
+    return global_rank() == 0
+
+def _use_gpu(training_config: DictConfig) -> bool:
+    accelerator = training_config.get("accelerator", "auto")
+    if accelerator == "auto":
+        return torch.cuda.is_available()
+    return accelerator in ("gpu", "cuda")
+
+def local_device(training_config: DictConfig) -> torch.device:
+    """Device of this process: its local GPU, or the CPU."""
+    if _use_gpu(training_config):
+        return torch.device("cuda", int(os.environ.get("LOCAL_RANK", 0)))
+    return torch.device("cpu")
+
+def init_distributed(training_config: DictConfig) -> bool:
+    """
+    Join the process group early when the job was started by an external launcher (torchrun, srun torchrun).
+
+    This lets the data preparation steps synchronize with `rank_zero_first` before the model is set up;
+    Lightning reuses the initialized process group. Returns whether a process group is available. Jobs whose
+    extra processes are spawned by Lightning itself don't need it: rank 0 prepares the data before launching them.
+    """
+    if dist.is_available() and dist.is_initialized():
+        return True
+    if int(os.environ.get("WORLD_SIZE", 1)) <= 1 or "RANK" not in os.environ or "MASTER_ADDR" not in os.environ:
+        return False
+    use_gpu = _use_gpu(training_config)
+    if use_gpu:
+        torch.cuda.set_device(int(os.environ.get("LOCAL_RANK", 0)))
+    dist.init_process_group(backend="nccl" if use_gpu else "gloo")
+    return True
+
+@contextmanager
+def rank_zero_first():
+    """
+    Run the body on rank 0 first, then on the other ranks once it is done, and only leave once every rank
+    has run it.
+
+    Steps that write files (mono conversion, normalization, caches, checkpoint download) must only do so
+    on rank 0, check `is_global_zero()` inside the body for those; idempotent steps such as config rewrites
+    then run on every rank and find rank 0's outputs in place.
+    """
+    synchronized = dist.is_available() and dist.is_initialized()
+    if synchronized and not is_global_zero():
+        dist.barrier()
+    try:
+        yield
+    finally:
+        if synchronized and is_global_zero():
+            dist.barrier()
+        # Rank 0 doesn't move on (e.g. to reading the outputs) while the other ranks are still in the body
+        if synchronized:
+            dist.barrier()
+
+def trainer_kwargs(training_config: DictConfig) -> Dict[str, Any]:
+    """
+    Device, node and strategy arguments of the Trainer from the `training` section of the YAML config:
+
+        accelerator: "auto"    # "gpu", "cpu" or "auto" (GPU if available)
+        devices: 1             # devices per node, a list of device ids or "auto"
+        num_nodes: 1
+        strategy: "auto"       # "auto", "ddp" or "fsdp"
+        find_unused_parameters: False
+
+    DDP on CPU uses the gloo backend, so the distributed code path can be run on a machine without GPU with
+    `accelerator: cpu` and `devices: <number of processes>`.
+    """
+    from lightning.pytorch.strategies import DDPStrategy, FSDPStrategy
+
+    use_gpu = _use_gpu(training_config)
+    devices = training_config.get("devices", 1)
+    num_nodes = training_config.get("num_nodes", 1)
+    strategy = training_config.get("strategy", "auto")
+    find_unused_parameters = training_config.get("find_unused_parameters", False)
+
+    if isinstance(devices, ListConfig):
+        # Explicit device ids, e.g. [0, 1]
+        devices = list(devices)
+    num_devices = len(devices) if isinstance(devices, list) else int(devices) if devices != "auto" else -1
+    distributed = num_nodes > 1 or num_devices == -1 or num_devices > 1
+    if strategy == "fsdp":
+        if not use_gpu:
+            raise ValueError("training.strategy: fsdp needs GPUs, use ddp with accelerator: cpu")
+        strategy = FSDPStrategy()
+    elif strategy == "ddp" or (strategy == "auto" and distributed):
+        strategy = DDPStrategy(
+            process_group_backend="nccl" if use_gpu else "gloo",
+            find_unused_parameters=find_unused_parameters,
+        )
+    return {
+        "accelerator": "gpu" if use_gpu else "cpu",
+        "devices": devices,
+        "num_nodes": num_nodes,
+        "strategy": strategy,
+    }
@@ -0,0 +1,173 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Optional
+import hashlib
+import json
+import os
+import torch
+import torch.nn as nn
+from omegaconf import DictConfig, OmegaConf
+from tqdm import tqdm
+from .distributed import local_device
+from .helpers import _text_to_ids
+from .feature_cache import (
+    MANIFEST_FILE,
+    ArrayStoreWriter,
+    AudioDataset,
+    CachedFeaturePreprocessor,
+    FeatureCacheDataset,
+    adopt_state,
+    cache_subdir,
+    check_loader_options,
+    collate_audio,
+    collate_features,
+    disable_forward_typecheck,
+    manifest_meta,
+    read_manifest,
+    restore_forward_typecheck,
+    store_is_valid,
+)
+
+def encoder_fingerprint(encoder: nn.Module) -> str:
+    """Fingerprint of the encoder weights: a digest of the per-tensor sums, enough to tell checkpoints apart."""
+    with torch.no_grad():
+        sums = [float(p.detach().double().sum()) for p in encoder.state_dict().values() if p.is_floating_point()]
+    return hashlib.sha1(json.dumps(sums).encode()).hexdigest()
+
+def build_encoder_cache(
+    model, loader_config: DictConfig, cache_dir: str, shard_size_mb: float = 1024, batch_size: int = 16,
+    num_workers: int = 4,
+) -> str:
+    """
+    Run the preprocessor and the frozen encoder once over a data loader's manifest and store the outputs.
+
+    Encoder outputs are stored as float16 [T', d_model] arrays in a sharded `ArrayStore`, next to a copy of the
+    kept manifest entries. Inputs are not augmented (no dither, no SpecAugment). The cache is reused as long as
+    the manifest, the duration limits, the preprocessor config and the encoder weights are unchanged.
+
+    Returns:
+        str: The directory of the cache.
+    """
+    meta = manifest_meta(loader_config)
+    meta["preprocessor"] = OmegaConf.to_container(model.cfg.preprocessor, resolve=True)
+    meta["encoder"] = encoder_fingerprint(model.encoder)
+    store_dir = cache_subdir(cache_dir, meta)
+    if store_is_valid(store_dir, meta):
+        print(f"Reusing encoder cache {store_dir}")
+        return store_dir
+
+    entries = read_manifest(loader_config)
+    device = next(model.parameters()).device
+    dither = getattr(model.preprocessor.featurizer, "dither", 0.0)
+    model.preprocessor.featurizer.dither = 0.0
+    was_training = model.training
+    model.eval()
+
+    loader = torch.utils.data.DataLoader(
+        AudioDataset(entries, model.cfg.preprocessor.sample_rate),
+        batch_size=batch_size, num_workers=num_workers, collate_fn=collate_audio,
+    )
+    writer = None
+    try:
+        with torch.no_grad():
+            for signals, lengths in tqdm(loader, desc=f"Caching encoder outputs of {loader_config.manifest_filepath}"):
+                features, feature_lengths = model.preprocessor(input_signal=signals.to(device), length=lengths.to(device))
+                encoded, encoded_lengths = model.encoder(audio_signal=features, length=feature_lengths)
+                encoded = encoded.transpose(1, 2).float().cpu().numpy()
+                if writer is None:
+                    writer = ArrayStoreWriter(store_dir, encoded.shape[-1], shard_size_mb=shard_size_mb)
+                for output, length in zip(encoded, encoded_lengths.tolist()):
+                    writer.append(output[:length])
+    finally:
+        model.preprocessor.featurizer.dither = dither
+        model.train(was_training)
+
+    if writer is None:
+        raise ValueError(f"No utterance of {loader_config.manifest_filepath} is within the duration limits")
+    with open(os.path.join(store_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    writer.close(meta)
+    return store_dir
+
+class CachedEncoder(nn.Module):
+    """
+    Stand-in for a frozen encoder when batches already hold its outputs: the "signal" is passed through
+    to the decoders. The encoder's weights stay registered so checkpoints keep the same state dict.
+    """
+    def __init__(self, encoder: nn.Module):
+        super().__init__()
+        adopt_state(self, encoder)
+
+    def forward(self, audio_signal, length):
+        return audio_signal.float(), length
+
+def setup_encoder_cache(model, config: DictConfig) -> None:
+    """
+    Build (or reuse) the encoder output caches of the train and valid loaders and train the decoders from them.
+
+    Must be called after the model's `setup_*_data` methods, with a frozen encoder. The train and validation
+    loaders are replaced by ones reading the caches, the preprocessor and encoder by pass-through modules
+    and SpecAugment is disabled; call `restore_encoder` before saving or testing the model.
+    BatchNorm and SqueezeExcite layers kept trainable by `enable_bn_se` are not updated in this mode. Loaders
+    setting dataset options the cache doesn't implement (`feature_cache.UNSUPPORTED_OPTIONS`) are rejected.
+    """
+    if not config.training.freeze_encoder:
+        raise ValueError("The encoder cache is only valid with training.freeze_encoder: True")
+
+    cache_config = config.training.encoder_cache
+    loaders = {
+        "_train_dl": config.data_loaders.train,
+        "_validation_dl": config.data_loaders.valid,
+    }
+    for loader_config in loaders.values():
+        check_loader_options(loader_config, "encoder_cache")
+
+    # The local GPU of each distributed rank
+    model.to(local_device(config.training))
+    for attr, loader_config in loaders.items():
+        store_dir = build_encoder_cache(
+            model, loader_config, cache_config.dir,
+            shard_size_mb=cache_config.get("shard_size_mb", 1024),
+            batch_size=cache_config.get("batch_size", 16),
+            num_workers=cache_config.get("num_workers", loader_config.get("num_workers", 4)),
+        )
+        setattr(model, attr, torch.utils.data.DataLoader(
+            FeatureCacheDataset(store_dir, _text_to_ids(model, loader_config.get("labels", None))),
+            batch_size=loader_config.batch_size,
+            shuffle=loader_config.get("shuffle", False),
+            num_workers=loader_config.get("num_workers", 0),
+            pin_memory=loader_config.get("pin_memory", False),
+            collate_fn=collate_features,
+        ))
+    model.cpu()
+
+    model.__dict__["_cached_spec_augmentation"] = model.spec_augmentation
+    model.spec_augmentation = None
+    model.preprocessor = CachedFeaturePreprocessor(model.preprocessor)
+    model.encoder = CachedEncoder(model.encoder)
+    # The "audio" signal is now a [B, d_model, T'] encoder output tensor
+    disable_forward_typecheck(model)
+    print(f"Training the decoders from cached encoder outputs in {cache_config.dir}")
+
+def restore_encoder(model, test_data_config: Optional[DictConfig] = None) -> None:
+    """Put back the original encoder, preprocessor and SpecAugment, and the raw audio test loader if its config is given."""
+    if isinstance(model.encoder, CachedEncoder):
+        model.encoder = model.encoder.original
+        model.preprocessor = model.preprocessor.original
+        model.spec_augmentation = model.__dict__.pop("_cached_spec_augmentation")
+        restore_forward_typecheck(model)
+        if test_data_config is not None:
+            model.setup_test_data(test_data_config=test_data_config)
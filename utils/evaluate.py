@@ -0,0 +1,211 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.evaluate --reference=bam-asr-all/manifests/test-manifest.json \
+#         --hypothesis predictions-tdt.jsonl predictions-ctc.jsonl \
+#         --output=evaluation.json
+#
+# Hypothesis files are JSONL files with `audio_filepath` and `pred_text` fields, such as the ones written
+# by transcribe_manifest.py. They are matched to the reference manifest by `audio_filepath`, and WER and
+# CER are reported overall, per subset and per duration bucket. By default the subset of an utterance is
+# the name of the directory two levels above its audio file (e.g. `jeli-asr-rmai` for
+# `bam-asr-all/jeli-asr-rmai/test/x.wav`), use --subset_key to read it from a manifest field instead.
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import math
+import os
+import re
+import unicodedata
+
+DEFAULT_DURATION_BUCKETS = [0, 5, 10, 20, 30, math.inf]
+
+def edit_distance(a: Sequence, b: Sequence) -> int:
+    """
+    Levenshtein distance between two sequences with Hyyrö's bit-parallel algorithm.
+
+    Each column of the dynamic programming matrix is held in the bits of a Python integer, so the cost is one
+    handful of integer operations per element of `b` instead of one per cell.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    m = len(a)
+    peq = {}
+    for i, token in enumerate(a):
+        peq[token] = peq.get(token, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for token in b:
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+def normalize_text(text: str, lower_case: bool = False, remove_punctuation: bool = False) -> str:
+    """NFC-normalize and collapse whitespace, optionally lowercasing and dropping punctuation."""
+    text = unicodedata.normalize("NFC", text)
+    if lower_case:
+        text = text.lower()
+    if remove_punctuation:
+        text = "".join(c for c in text if not unicodedata.category(c).startswith("P") or c in "'-")
+    return re.sub(r"\s+", " ", text).strip()
+
+def _pair_errors(pair: Tuple[str, str]) -> Tuple[int, int, int, int]:
+    """Worker: (word errors, reference words, char errors, reference chars) of one utterance."""
+    reference, hypothesis = pair
+    ref_words, hyp_words = reference.split(), hypothesis.split()
+    return (
+        edit_distance(ref_words, hyp_words), len(ref_words),
+        edit_distance(reference, hypothesis), len(reference),
+    )
+
+def compute_errors(pairs: List[Tuple[str, str]], num_workers: Optional[int] = None, chunksize: int = 256):
+    """Edit distances of all (reference, hypothesis) pairs, fanned out over a process pool for large inputs."""
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers == 1 or len(pairs) < 4 * chunksize:
+        return [_pair_errors(pair) for pair in pairs]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(_pair_errors, pairs, chunksize=chunksize))
+
+def _rates(errors) -> Dict[str, float]:
+    word_errors = sum(e[0] for e in errors)
+    words = sum(e[1] for e in errors)
+    char_errors = sum(e[2] for e in errors)
+    chars = sum(e[3] for e in errors)
+    return {
+        "num_utterances": len(errors),
+        "wer": word_errors / words if words else 0.0,
+        "cer": char_errors / chars if chars else 0.0,
+        "word_errors": word_errors,
+        "num_words": words,
+    }
+
+def default_subset(audio_filepath: str) -> str:
+    """Name of the directory two levels above the audio file, e.g. the source dataset of bam-asr-all."""
+    return os.path.basename(os.path.dirname(os.path.dirname(audio_filepath))) or "all"
+
+def duration_bucket(duration: float, edges: Sequence[float]) -> str:
+    for low, high in zip(edges[:-1], edges[1:]):
+        if low <= duration < high:
+            return f"{low:g}-{high:g}s"
+    return "other"
+
+def evaluate(
+    references: Dict[str, dict],
+    hypotheses: List[dict],
+    subset_key: Optional[str] = None,
+    duration_edges: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+    lower_case: bool = False,
+    remove_punctuation: bool = False,
+    num_workers: Optional[int] = None,
+) -> Dict:
+    """
+    Compute WER/CER of hypotheses against reference entries keyed by `audio_filepath`, overall and
+    broken down by subset and duration bucket. Hypotheses without a reference are counted as missing. Only the
+    last hypothesis of a repeated `audio_filepath` is scored, the others are counted as duplicates.
+    """
+    latest = {hypothesis["audio_filepath"]: hypothesis for hypothesis in hypotheses}
+    pairs, groups, missing, answered = [], [], 0, set()
+    for hypothesis in latest.values():
+        reference = references.get(hypothesis["audio_filepath"])
+        if reference is None:
+            missing += 1
+            continue
+        answered.add(hypothesis["audio_filepath"])
+        pairs.append((
+            normalize_text(reference["text"], lower_case, remove_punctuation),
+            normalize_text(hypothesis.get("pred_text") or "", lower_case, remove_punctuation),
+        ))
+        subset = reference.get(subset_key, "unknown") if subset_key else default_subset(reference["audio_filepath"])
+        groups.append((str(subset), duration_bucket(reference.get("duration", 0.0), duration_edges)))
+
+    errors = compute_errors(pairs, num_workers=num_workers)
+    by_subset, by_duration = {}, {}
+    for error, (subset, bucket) in zip(errors, groups):
+        by_subset.setdefault(subset, []).append(error)
+        by_duration.setdefault(bucket, []).append(error)
+
+    return {
+        "overall": _rates(errors),
+        "num_missing_references": missing,
+        "num_duplicate_hypotheses": len(hypotheses) - len(latest),
+        "num_unanswered_references": len(references) - len(answered),
+        "by_subset": {k: _rates(v) for k, v in sorted(by_subset.items())},
+        "by_duration": {
+            k: _rates(by_duration[k]) for k in
+            [duration_bucket(low, duration_edges) for low in duration_edges[:-1]] + ["other"] if k in by_duration
+        },
+    }
+
+def _read_jsonl(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="WER/CER evaluation of transcription JSONL files")
+    parser.add_argument("--reference", default=None, type=str, help="Reference manifest, defaults to the `text` field of the hypothesis files")
+    parser.add_argument("--hypothesis", required=True, nargs="+", type=str, help="Hypothesis JSONL files with `pred_text`")
+    parser.add_argument("--output", default=None, type=str, help="Write the full report to this JSON file")
+    parser.add_argument("--subset_key", default=None, type=str, help="Manifest field holding the subset name")
+    parser.add_argument(
+        "--duration_buckets", default=",".join(f"{e:g}" for e in DEFAULT_DURATION_BUCKETS), type=str,
+        help="Comma separated duration bucket edges in seconds"
+    )
+    parser.add_argument("--lower_case", action="store_true", help="Lowercase references and hypotheses")
+    parser.add_argument("--remove_punctuation", action="store_true", help="Drop punctuation before scoring")
+    parser.add_argument("--num_workers", default=None, type=int, help="Number of processes computing edit distances")
+    args = parser.parse_args()
+
+    duration_edges = [float(edge) for edge in args.duration_buckets.split(",")]
+    reports = {}
+    for hypothesis_path in args.hypothesis:
+        hypotheses = _read_jsonl(hypothesis_path)
+        reference_entries = _read_jsonl(args.reference) if args.reference else hypotheses
+        references = {entry["audio_filepath"]: entry for entry in reference_entries}
+        report = evaluate(
+            references, hypotheses,
+            subset_key=args.subset_key,
+            duration_edges=duration_edges,
+            lower_case=args.lower_case,
+            remove_punctuation=args.remove_punctuation,
+            num_workers=args.num_workers,
+        )
+        reports[hypothesis_path] = report
+
+        print(f"\n{hypothesis_path}: WER {report['overall']['wer']:.2%}, CER {report['overall']['cer']:.2%} "
+              f"on {report['overall']['num_utterances']} utterances")
+        for title, breakdown in (("subset", report["by_subset"]), ("duration", report["by_duration"])):
+            for name, rates in breakdown.items():
+                print(f"  {title:<8} {name:<24} WER {rates['wer']:7.2%}  CER {rates['cer']:7.2%}  n={rates['num_utterances']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
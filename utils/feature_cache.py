@@ -0,0 +1,361 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Callable, List, Optional
+import hashlib
+import json
+import os
+import librosa
+import numpy as np
+import soundfile as sf
+import torch
+import torch.nn as nn
+from omegaconf import DictConfig, OmegaConf
+from tqdm import tqdm
+from .distributed import local_device
+from .helpers import _text_to_ids
+
+INDEX_FILE = "index.npy"
+META_FILE = "meta.json"
+MANIFEST_FILE = "manifest.json"
+
+class ArrayStoreWriter:
+    """
+    Append variable-length float16 arrays of shape [T, dim] to flat binary shard files.
+
+    The index saved on `close()` has one (shard, offset, length) row per array, offsets and lengths being
+    counted in rows of `dim` values. A new shard is started once the current one exceeds `shard_size_mb`.
+    """
+    def __init__(self, store_dir: str, dim: int, shard_size_mb: Optional[float] = None):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.dim = dim
+        self.max_rows = int(shard_size_mb * 1024 * 1024 / (2 * dim)) if shard_size_mb else None
+        self.index = []
+        self._shard = -1
+        self._rows = 0
+        self._file = None
+        self._next_shard()
+
+    def _next_shard(self):
+        if self._file is not None:
+            self._file.close()
+        self._shard += 1
+        self._rows = 0
+        self._file = open(os.path.join(self.store_dir, f"shard_{self._shard}.f16"), "wb")
+
+    def append(self, array: np.ndarray) -> None:
+        if self.max_rows is not None and self._rows and self._rows + len(array) > self.max_rows:
+            self._next_shard()
+        self._file.write(np.ascontiguousarray(array, dtype=np.float16).tobytes())
+        self.index.append((self._shard, self._rows, len(array)))
+        self._rows += len(array)
+
+    def close(self, meta: dict) -> None:
+        """Flush the last shard and write the index and the metadata, which marks the store as complete."""
+        self._file.close()
+        np.save(os.path.join(self.store_dir, INDEX_FILE), np.asarray(self.index, dtype=np.int64).reshape(-1, 3))
+        with open(os.path.join(self.store_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({**meta, "dim": self.dim, "num_shards": self._shard + 1, "num_entries": len(self.index)}, f)
+
+class ArrayStore:
+    """
+    Read-only, memory-mapped view of a store written by `ArrayStoreWriter`.
+
+    Shards are mapped lazily in each process, so the store can be handed to data loader workers and the
+    pages are shared through the OS page cache instead of being copied into every worker.
+    """
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self.index = np.load(os.path.join(store_dir, INDEX_FILE))
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def _shard(self, shard_id: int) -> np.memmap:
+        if shard_id not in self._shards:
+            path = os.path.join(self.store_dir, f"shard_{shard_id}.f16")
+            self._shards[shard_id] = np.memmap(path, dtype=np.float16, mode="r").reshape(-1, self.dim)
+        return self._shards[shard_id]
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        shard_id, offset, length = self.index[idx]
+        return self._shard(int(shard_id))[offset:offset + length]
+
+# Options of NeMo's audio datasets that the cache datasets don't implement, with their neutral values. The
+# caches store un-augmented inputs, so a loader setting any of these would silently train without them.
+UNSUPPORTED_OPTIONS = {
+    "is_tarred": False,
+    "use_lhotse": False,
+    "trim_silence": False,
+    "augmentor": None,
+    "max_utts": 0,
+    "int_values": False,
+    "channel_selector": None,
+}
+
+def check_loader_options(loader_config: DictConfig, cache: str) -> None:
+    """Raise if a data loader section sets options the `training.<cache>` datasets would silently ignore."""
+    unsupported = [
+        key for key, neutral in UNSUPPORTED_OPTIONS.items()
+        if loader_config.get(key, neutral) not in (neutral, None)
+    ]
+    if unsupported:
+        raise ValueError(
+            f"The {cache.replace('_', ' ')} doesn't support the data loader options {', '.join(unsupported)} "
+            f"(tarred_dir and dynamic_batching set is_tarred and use_lhotse), disable training.{cache} to use them"
+        )
+
+def store_is_valid(store_dir: str, meta: dict) -> bool:
+    """A store can be reused if it was completely written with the same metadata."""
+    meta_path = os.path.join(store_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    return all(stored.get(k) == v for k, v in meta.items())
+
+def read_manifest(loader_config: DictConfig) -> List[dict]:
+    """Read a data loader's manifest, keeping the entries within its min/max_duration."""
+    min_duration = loader_config.get("min_duration", None) or 0.0
+    max_duration = loader_config.get("max_duration", None) or float("inf")
+    with open(loader_config.manifest_filepath, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [e for e in entries if min_duration <= e["duration"] <= max_duration]
+
+def manifest_meta(loader_config: DictConfig) -> dict:
+    """Metadata identifying a data loader's manifest, used to invalidate caches built from it."""
+    st = os.stat(loader_config.manifest_filepath)
+    return {
+        "manifest": os.path.abspath(loader_config.manifest_filepath),
+        "manifest_size": st.st_size,
+        "manifest_mtime_ns": st.st_mtime_ns,
+        "min_duration": loader_config.get("min_duration", None),
+        "max_duration": loader_config.get("max_duration", None),
+    }
+
+def cache_subdir(cache_dir: str, meta: dict) -> str:
+    """Loaders reading the same manifest with the same duration limits share one cache directory."""
+    key = json.dumps([meta["manifest"], meta["min_duration"], meta["max_duration"]])
+    name = os.path.splitext(os.path.basename(meta["manifest"]))[0]
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:10]}")
+
+class AudioDataset(torch.utils.data.Dataset):
+    """Minimal dataset decoding manifest audios to mono float32 at `sample_rate`."""
+    def __init__(self, entries: List[dict], sample_rate: int):
+        self.entries = entries
+        self.sample_rate = sample_rate
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, idx):
+        audio, sr = sf.read(self.entries[idx]["audio_filepath"], dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sr != self.sample_rate:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
+        return torch.from_numpy(audio)
+
+def collate_audio(batch):
+    lengths = torch.tensor([len(x) for x in batch], dtype=torch.long)
+    signals = torch.zeros(len(batch), int(lengths.max()))
+    for i, x in enumerate(batch):
+        signals[i, :len(x)] = x
+    return signals, lengths
+
+def build_feature_cache(model, loader_config: DictConfig, cache_dir: str, batch_size: int = 16, num_workers: int = 4) -> str:
+    """
+    Compute the preprocessor output (log-mel features) of every utterance of a data loader once.
+
+    Features are stored as float16 [T, n_mels] arrays in an `ArrayStore` next to a copy of the kept manifest
+    entries. Dithering is disabled while caching so the features are deterministic. The cache is reused as
+    long as the manifest, the duration limits and the preprocessor config are unchanged.
+
+    Returns:
+        str: The directory of the cache.
+    """
+    meta = manifest_meta(loader_config)
+    meta["preprocessor"] = OmegaConf.to_container(model.cfg.preprocessor, resolve=True)
+    store_dir = cache_subdir(cache_dir, meta)
+    if store_is_valid(store_dir, meta):
+        print(f"Reusing feature cache {store_dir}")
+        return store_dir
+
+    entries = read_manifest(loader_config)
+    device = next(model.parameters()).device
+    preprocessor = model.preprocessor
+    dither = getattr(preprocessor.featurizer, "dither", 0.0)
+    preprocessor.featurizer.dither = 0.0
+    was_training = preprocessor.training
+    preprocessor.eval()
+
+    loader = torch.utils.data.DataLoader(
+        AudioDataset(entries, model.cfg.preprocessor.sample_rate),
+        batch_size=batch_size, num_workers=num_workers, collate_fn=collate_audio,
+    )
+    writer = None
+    try:
+        with torch.no_grad():
+            for signals, lengths in tqdm(loader, desc=f"Caching features of {loader_config.manifest_filepath}"):
+                features, feature_lengths = preprocessor(input_signal=signals.to(device), length=lengths.to(device))
+                features = features.transpose(1, 2).float().cpu().numpy()
+                if writer is None:
+                    writer = ArrayStoreWriter(store_dir, features.shape[-1])
+                for feature, length in zip(features, feature_lengths.tolist()):
+                    writer.append(feature[:length])
+    finally:
+        preprocessor.featurizer.dither = dither
+        preprocessor.train(was_training)
+
+    if writer is None:
+        raise ValueError(f"No utterance of {loader_config.manifest_filepath} is within the duration limits")
+    with open(os.path.join(store_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    writer.close(meta)
+    return store_dir
+
+class FeatureCacheDataset(torch.utils.data.Dataset):
+    """
+    Dataset serving cached features in the (signal, signal_len, tokens, tokens_len) layout of NeMo's ASR
+    datasets, the signal being a [n_mels, T] feature matrix instead of a waveform.
+    """
+    def __init__(self, store_dir: str, text_to_ids: Callable[[str], List[int]]):
+        self.store = ArrayStore(store_dir)
+        with open(os.path.join(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            # Tokenized once here so workers only slice arrays
+            self.tokens = [np.asarray(text_to_ids(json.loads(line)["text"]), dtype=np.int64) for line in f]
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, idx):
+        features = torch.from_numpy(np.array(self.store[idx], dtype=np.float32)).t()
+        tokens = torch.from_numpy(self.tokens[idx])
+        return features, torch.tensor(features.shape[1]), tokens, torch.tensor(len(tokens))
+
+def collate_features(batch):
+    features, feature_lengths, tokens, token_lengths = zip(*batch)
+    feature_lengths = torch.stack(feature_lengths)
+    token_lengths = torch.stack(token_lengths)
+    padded_features = torch.zeros(len(batch), features[0].shape[0], int(feature_lengths.max()))
+    padded_tokens = torch.zeros(len(batch), max(1, int(token_lengths.max())), dtype=torch.long)
+    for i, (feature, token) in enumerate(zip(features, tokens)):
+        padded_features[i, :, :feature.shape[1]] = feature
+        padded_tokens[i, :len(token)] = token
+    return padded_features, feature_lengths, padded_tokens, token_lengths
+
+def adopt_state(wrapper: nn.Module, module: nn.Module) -> None:
+    """
+    Register the children, parameters and buffers of `module` on `wrapper`, so a stand-in module exposes
+    exactly the same state dict keys as the module it replaces and checkpoints stay interchangeable.
+    """
+    wrapper.__dict__["original"] = module
+    for name, child in module.named_children():
+        wrapper.add_module(name, child)
+    for name, param in module.named_parameters(recurse=False):
+        wrapper.register_parameter(name, param)
+    for name, buffer in module.named_buffers(recurse=False):
+        wrapper.register_buffer(name, buffer, persistent=name not in module._non_persistent_buffers_set)
+
+class CachedFeaturePreprocessor(nn.Module):
+    """
+    Stand-in for the model preprocessor when batches already hold features: the "signal" is passed through,
+    so SpecAugment and the rest of the model's forward still run on the fly.
+    """
+    def __init__(self, preprocessor: nn.Module):
+        super().__init__()
+        adopt_state(self, preprocessor)
+
+    def forward(self, input_signal, length):
+        return input_signal.float(), length
+
+def disable_forward_typecheck(model) -> None:
+    """
+    Run the model's forward with NeMo's type checks disabled, its "audio" signal being cached features or
+    encoder outputs. The checks are only switched off for the duration of each forward call, not process-wide.
+    """
+    from nemo.core.classes.common import typecheck
+
+    if "forward" in model.__dict__:
+        return
+    forward = model.forward
+
+    def unchecked_forward(*args, **kwargs):
+        with typecheck.disable_checks():
+            return forward(*args, **kwargs)
+
+    model.forward = unchecked_forward
+
+def restore_forward_typecheck(model) -> None:
+    model.__dict__.pop("forward", None)
+
+def setup_feature_cache(model, config: DictConfig) -> None:
+    """
+    Build (or reuse) the feature caches of the train, valid and test loaders and train from them.
+
+    Must be called after the model's `setup_*_data` methods. The data loaders are replaced by ones reading the
+    caches, and the preprocessor by a `CachedFeaturePreprocessor`; call `restore_preprocessor` before saving
+    the model. Loaders setting dataset options the cache doesn't implement (`UNSUPPORTED_OPTIONS`: tarred or
+    lhotse inputs, silence trimming, augmentation such as speed perturbation...) are rejected.
+    """
+    cache_config = config.training.feature_cache
+    loaders = {
+        "_train_dl": config.data_loaders.train,
+        "_validation_dl": config.data_loaders.valid,
+        "_test_dl": config.data_loaders.test,
+    }
+    for loader_config in loaders.values():
+        check_loader_options(loader_config, "feature_cache")
+
+    # The local GPU of each distributed rank
+    model.to(local_device(config.training))
+    for attr, loader_config in loaders.items():
+        store_dir = build_feature_cache(
+            model, loader_config, cache_config.dir,
+            batch_size=cache_config.get("batch_size", 16),
+            num_workers=cache_config.get("num_workers", loader_config.get("num_workers", 4)),
+        )
+        dataset = FeatureCacheDataset(store_dir, _text_to_ids(model, loader_config.get("labels", None)))
+        setattr(model, attr, torch.utils.data.DataLoader(
+            dataset,
+            batch_size=loader_config.batch_size,
+            shuffle=loader_config.get("shuffle", False),
+            num_workers=loader_config.get("num_workers", 0),
+            pin_memory=loader_config.get("pin_memory", False),
+            collate_fn=collate_features,
+        ))
+    model.cpu()
+
+    model.preprocessor = CachedFeaturePreprocessor(model.preprocessor)
+    # The "audio" signal is now a [B, n_mels, T] feature tensor
+    disable_forward_typecheck(model)
+    print(f"Training from cached features in {cache_config.dir}")
+
+def restore_preprocessor(model, test_data_config: Optional[DictConfig] = None) -> None:
+    """Put back the original preprocessor, and the raw audio test loader if its config is given."""
+    if isinstance(model.preprocessor, CachedFeaturePreprocessor):
+        model.preprocessor = model.preprocessor.original
+        restore_forward_typecheck(model)
+        if test_data_config is not None:
+            model.setup_test_data(test_data_config=test_data_config)
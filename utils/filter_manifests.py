@@ -0,0 +1,193 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.filter_manifests --manifest=<paths to manifests, separated by commas> \
+#         --output_dir="<output directory>" \
+#         --tokenizer_dir="bam-tokenizer/tokenizer_spe_bpe_v1024" \
+#         --subsampling_factor=8
+# or
+#       python -m utils.filter_manifests --config=configs/parakeet-110m-config-v6.yaml --output_dir="<output directory>" \
+#         --subsampling_factor=8
+#
+# With --config, the sample rate and the min_duration/max_duration limits default to those of the config's
+# train loader. The config doesn't record the encoder's time reduction, so --subsampling_factor is then required.
+# Streams the manifests, tokenizes the transcripts in batches and drops the utterances whose
+# subsampled frame count can't fit their target sequence (the condition counted by
+# `analyse_ctc_failures_in_model`). Each manifest is written filtered to the output directory, with
+# a `<name>.stats.json` file holding the drop counts, duration percentiles and token rates that can
+# be used to set `min_duration`/`max_duration` in the configs.
+from typing import Callable, Dict, List
+import argparse
+import json
+import math
+import os
+import numpy as np
+import sentencepiece as spm
+import tokenizers
+from omegaconf import OmegaConf
+from .helpers import encoder_output_lengths
+from .preflight import _paths
+
+PERCENTILES = [0.1, 1, 5, 50, 95, 99, 99.9]
+
+def load_tokenizer(
+    tokenizer_dir: str, tokenizer_type: str = "bpe", num_threads: int = -1
+) -> Callable[[List[str]], List[List[int]]]:
+    """
+    Batch tokenizer from a `process_asr_text_tokenizer.py` output directory: SentencePiece `tokenizer.model`
+    for `bpe`, WordPiece `vocab.txt` for `wpe`. Characters are counted for `char` or if no directory is given.
+    """
+    if tokenizer_type == "char" or not tokenizer_dir:
+        return lambda texts: [list(text) for text in texts]
+    if tokenizer_type == "wpe":
+        wordpiece = tokenizers.BertWordPieceTokenizer(os.path.join(tokenizer_dir, "vocab.txt"), lowercase=False)
+        return lambda texts: [e.ids for e in wordpiece.encode_batch(texts, add_special_tokens=False)]
+    if tokenizer_type != "bpe":
+        raise ValueError(f"Unknown tokenizer type {tokenizer_type}, expected bpe, wpe or char")
+    processor = spm.SentencePieceProcessor(model_file=os.path.join(tokenizer_dir, "tokenizer.model"))
+    return lambda texts: processor.encode(texts, num_threads=num_threads)
+
+def filter_manifest(
+    manifest_path: str,
+    output_path: str,
+    tokenize: Callable[[List[str]], List[List[int]]],
+    preprocessor_cfg,
+    encoder_cfg,
+    min_duration: float = 0.0,
+    max_duration: float = math.inf,
+    margin: int = 0,
+    batch_size: int = 4096,
+) -> Dict:
+    """
+    Write the feasible entries of a manifest to `output_path` and return statistics about the filtering.
+
+    An entry is kept if its duration is within [min_duration, max_duration] and its encoder output length is
+    greater than its number of tokens plus `margin`. The manifest is processed `batch_size` lines at a time.
+    """
+    stats = {"manifest": manifest_path, "num_entries": 0, "num_kept": 0, "too_short": 0, "too_long": 0, "infeasible": 0}
+    kept_durations, kept_tokens, infeasible_durations = [], [], []
+
+    def flush(lines, items, fout):
+        durations = np.asarray([item["duration"] for item in items], dtype=np.float64)
+        target_lengths = np.asarray([len(ids) for ids in tokenize([item["text"] for item in items])], dtype=np.int64)
+        am_lengths = encoder_output_lengths(durations, preprocessor_cfg, encoder_cfg)
+        too_short = durations < min_duration
+        too_long = durations > max_duration
+        infeasible = ~too_short & ~too_long & (am_lengths <= target_lengths + margin)
+        keep = ~(too_short | too_long | infeasible)
+        stats["too_short"] += int(too_short.sum())
+        stats["too_long"] += int(too_long.sum())
+        stats["infeasible"] += int(infeasible.sum())
+        stats["num_kept"] += int(keep.sum())
+        kept_durations.append(durations[keep])
+        kept_tokens.append(target_lengths[keep])
+        infeasible_durations.append(durations[infeasible])
+        fout.writelines(lines[i] for i in np.flatnonzero(keep))
+
+    with open(manifest_path, "r", encoding="utf-8") as fin, open(output_path, "w", encoding="utf-8") as fout:
+        lines, items = [], []
+        for line in fin:
+            if not line.strip():
+                continue
+            lines.append(line if line.endswith("\n") else line + "\n")
+            items.append(json.loads(line))
+            if len(lines) == batch_size:
+                flush(lines, items, fout)
+                lines, items = [], []
+        if lines:
+            flush(lines, items, fout)
+
+    kept_durations = np.concatenate(kept_durations) if kept_durations else np.zeros(0)
+    kept_tokens = np.concatenate(kept_tokens) if kept_tokens else np.zeros(0)
+    infeasible_durations = np.concatenate(infeasible_durations) if infeasible_durations else np.zeros(0)
+    stats["num_entries"] = stats["num_kept"] + stats["too_short"] + stats["too_long"] + stats["infeasible"]
+    if len(kept_durations):
+        stats["kept_duration_hours"] = float(kept_durations.sum() / 3600)
+        stats["duration_percentiles"] = dict(zip(map(str, PERCENTILES), np.percentile(kept_durations, PERCENTILES).tolist()))
+        stats["tokens_per_second"] = float(kept_tokens.sum() / kept_durations.sum())
+        stats["mean_tokens_per_utterance"] = float(kept_tokens.mean())
+    if len(infeasible_durations):
+        # Raising min_duration above this drops every infeasible utterance (and maybe some feasible ones)
+        stats["max_infeasible_duration"] = float(infeasible_durations.max())
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop CTC/TDT infeasible utterances from manifests")
+    parser.add_argument("--config", default=None, type=str, help="Training YAML config to read the tokenizer and train manifest from")
+    parser.add_argument("--manifest", default=None, type=str, help="Comma separated list of manifest files")
+    parser.add_argument("--output_dir", required=True, type=str, help="Output directory")
+    parser.add_argument("--tokenizer_dir", default=None, type=str, help="Tokenizer directory, characters are counted if unset")
+    parser.add_argument(
+        "--tokenizer_type", default=None, choices=["bpe", "wpe", "char"],
+        help="Type of the tokenizer directory, defaults to the config's tokenizer.type or bpe"
+    )
+    parser.add_argument("--sample_rate", default=None, type=int, help="Sample rate of the preprocessor, defaults to the config's or 16000")
+    parser.add_argument("--window_stride", default=0.01, type=float, help="Hop of the preprocessor in seconds")
+    parser.add_argument(
+        "--subsampling_factor", default=None, type=int,
+        help="Time reduction of the encoder (8 for FastConformer, 2 for QuartzNet), required with --config, 8 otherwise"
+    )
+    parser.add_argument("--min_duration", default=None, type=float, help="Drop utterances shorter than this, defaults to the config's or 0")
+    parser.add_argument("--max_duration", default=None, type=float, help="Drop utterances longer than this, defaults to the config's or no limit")
+    parser.add_argument("--margin", default=0, type=int, help="Frames required beyond the target length")
+    parser.add_argument("--batch_size", default=4096, type=int, help="Number of lines tokenized at once")
+    args = parser.parse_args()
+
+    manifests, tokenizer_dir, tokenizer_type = args.manifest, args.tokenizer_dir, args.tokenizer_type
+    loader_config = OmegaConf.create({})
+    if args.config is not None:
+        if args.subsampling_factor is None:
+            parser.error("--subsampling_factor is required with --config (8 for FastConformer, 2 for QuartzNet)")
+        config = OmegaConf.load(args.config)
+        loader_config = config.data_loaders.train
+        manifests = manifests or loader_config.manifest_filepath
+        tokenizer_type = tokenizer_type or config.tokenizer.get("type", None)
+        if tokenizer_type != "char":
+            tokenizer_dir = tokenizer_dir or OmegaConf.select(config, "tokenizer.path", default=None)
+    if not manifests:
+        parser.error("--manifest or --config is required")
+
+    sample_rate = args.sample_rate or loader_config.get("sample_rate", None) or 16000
+    min_duration = args.min_duration if args.min_duration is not None else loader_config.get("min_duration", None) or 0.0
+    max_duration = args.max_duration if args.max_duration is not None else loader_config.get("max_duration", None) or math.inf
+    print(f"Keeping utterances of {min_duration}s to {max_duration}s")
+
+    tokenize = load_tokenizer(tokenizer_dir, tokenizer_type or "bpe")
+    preprocessor_cfg = OmegaConf.create({"sample_rate": sample_rate, "window_stride": args.window_stride})
+    encoder_cfg = OmegaConf.create({"subsampling_factor": args.subsampling_factor or 8})
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # The config may list the manifests or give them comma separated
+    for manifest in _paths(manifests):
+        name = os.path.splitext(os.path.basename(manifest))[0]
+        stats = filter_manifest(
+            manifest,
+            os.path.join(args.output_dir, f"{name}.json"),
+            tokenize,
+            preprocessor_cfg,
+            encoder_cfg,
+            min_duration=min_duration,
+            max_duration=max_duration,
+            margin=args.margin,
+            batch_size=args.batch_size,
+        )
+        with open(os.path.join(args.output_dir, f"{name}.stats.json"), "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        print(
+            f"{manifest}: kept {stats['num_kept']}/{stats['num_entries']} "
+            f"({stats['infeasible']} infeasible, {stats['too_short']} too short, {stats['too_long']} too long)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,11 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and  
 limitations under the License.
 """
+import json
+import math
 from tqdm import tqdm
 from omegaconf import OmegaConf
+import numpy as np
 import torch
 import torch.nn as nn
 
@@ -32,7 +35,93 @@ def enable_bn_se(m):
         for param in m.parameters():
             param.requires_grad_(True)
 
-def analyse_ctc_failures_in_model(model):
+def encoder_subsampling_factor(encoder_cfg) -> int:
+    """
+    Time reduction of an encoder from its config: `subsampling_factor` for (Fast)Conformer encoders,
+    the product of the block strides for Jasper/QuartzNet encoders.
+    """
+    if encoder_cfg.get('subsampling_factor', None):
+        return int(encoder_cfg.subsampling_factor)
+    factor = 1
+    for block in encoder_cfg.get('jasper', []):
+        factor *= int(block.stride[0]) if block.get('stride', None) else 1
+    return factor
+
+def encoder_output_lengths(durations, preprocessor_cfg, encoder_cfg) -> np.ndarray:
+    """
+    Compute the acoustic sequence lengths the encoder will output for the given durations (in seconds),
+    without running the model.
+
+    The preprocessor produces `floor(num_samples / hop_length) + 1` frames (centered STFT), and each
+    stride-s "same"-padded convolution of the encoder maps L frames to `ceil(L / s)`, which composes into
+    `ceil(L / subsampling_factor)`.
+    """
+    hop_length = int(preprocessor_cfg.sample_rate * preprocessor_cfg.window_stride)
+    num_samples = np.floor(np.asarray(durations, dtype=np.float64) * preprocessor_cfg.sample_rate).astype(np.int64)
+    num_frames = num_samples // hop_length + 1
+    factor = encoder_subsampling_factor(encoder_cfg)
+    return -(-num_frames // factor)
+
+def _text_to_ids(model, labels=None):
+    """
+    The tokenization used by the model's datasets: its BPE tokenizer, or for character models the `labels`
+    of the data loader config, defaulting to the decoder's vocabulary.
+    """
+    if getattr(model, 'tokenizer', None) is not None:
+        return model.tokenizer.text_to_ids
+    label_ids = {label: i for i, label in enumerate(labels or model.decoder.vocabulary)}
+    return lambda text: [label_ids[c] for c in text if c in label_ids]
+
+def analyse_ctc_failures_in_manifest(model, manifest_path=None, min_duration=None, max_duration=None, failures_path=None):
+    """
+    Fast, forward-free version of `analyse_ctc_failures_in_model`.
+
+    Acoustic sequence lengths are computed analytically from the manifest durations and the encoder's
+    subsampling factor, transcripts are tokenized with the model's tokenizer and the comparison is done
+    in one vectorized operation over the whole manifest.
+
+    Args:
+        model (torch.nn.Module): The model whose preprocessor, encoder and tokenizer are used.
+        manifest_path (str, optional): Manifest to check, defaults to the model's training manifest.
+        min_duration (float, optional): Skip shorter utterances, defaults to the training data config's value.
+        max_duration (float, optional): Skip longer utterances, defaults to the training data config's value.
+        failures_path (str, optional): If given, the manifest lines that would fail are written there.
+
+    Returns:
+        tuple: A tuple containing:
+            - count_ctc_failures (int): The number of CTC loss computation failures.
+            - am_seq_lengths (list): A list of lengths of the acoustic model sequences.
+            - target_seq_lengths (list): A list of lengths of the target sequences.
+    """
+    train_ds = model.cfg.get('train_ds', None) or {}
+    manifest_path = manifest_path or train_ds.get('manifest_filepath')
+    min_duration = min_duration if min_duration is not None else (train_ds.get('min_duration', None) or 0.0)
+    max_duration = max_duration if max_duration is not None else (train_ds.get('max_duration', None) or math.inf)
+    text_to_ids = _text_to_ids(model)
+
+    lines, durations, target_seq_lengths = [], [], []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not min_duration <= item['duration'] <= max_duration:
+                continue
+            lines.append(line)
+            durations.append(item['duration'])
+            target_seq_lengths.append(len(text_to_ids(item['text'])))
+
+    am_seq_lengths = encoder_output_lengths(durations, model.cfg.preprocessor, model.cfg.encoder)
+    target_seq_lengths = np.asarray(target_seq_lengths, dtype=np.int64)
+    failures = am_seq_lengths <= target_seq_lengths
+
+    if failures_path is not None:
+        with open(failures_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[i] for i in np.flatnonzero(failures))
+
+    return int(failures.sum()), am_seq_lengths.tolist(), target_seq_lengths.tolist()
+
+def analyse_ctc_failures_in_model(model, fast=False, **kwargs):
     """
     Analyzes CTC (Connectionist Temporal Classification) failures in a given model.
 
@@ -43,6 +132,8 @@ def analyse_ctc_failures_in_model(model):
 
     Args:
         model (torch.nn.Module): The model to be analyzed.
+        fast (bool): Skip the forward pass and compute the lengths from the manifest instead,
+            see `analyse_ctc_failures_in_manifest` whose keyword arguments are accepted.
 
     Returns:
         tuple: A tuple containing:
@@ -50,7 +141,9 @@ def analyse_ctc_failures_in_model(model):
             - am_seq_lengths (list): A list of lengths of the acoustic model sequences.
             - target_seq_lengths (list): A list of lengths of the target sequences.
     """
-    count_ctc_failures = 0
+    if fast:
+        return analyse_ctc_failures_in_manifest(model, **kwargs)
+
     am_seq_lengths = []
     target_seq_lengths = []
 
@@ -67,23 +160,21 @@ def analyse_ctc_failures_in_model(model):
             x, x_len = x.to(device), x_len.to(device)
             x_logprobs, x_len = model(input_signal=x, input_signal_length=x_len)
 
-            # Find how many CTC loss computation failures will occur
-            for xl, yl in zip(x_len, y_len):
-                if xl <= yl:
-                    count_ctc_failures += 1
+            # Record lengths on the device, they are compared once at the end
+            am_seq_lengths.append(x_len)
+            target_seq_lengths.append(y_len.to(device))
 
-            # Record acoustic model lengths=
-            am_seq_lengths.extend(x_len.to('cpu').numpy().tolist())
-
-            # Record target sequence lengths
-            target_seq_lengths.extend(y_len.to('cpu').numpy().tolist())
-
-            del x, x_len, y, y_len, x_logprobs
+            del x, y, x_logprobs
 
     if mode:
         model = model.train()
 
-    return count_ctc_failures, am_seq_lengths, target_seq_lengths
+    am_seq_lengths = torch.cat(am_seq_lengths).cpu() if am_seq_lengths else torch.zeros(0, dtype=torch.long)
+    target_seq_lengths = torch.cat(target_seq_lengths).cpu() if target_seq_lengths else torch.zeros(0, dtype=torch.long)
+    # Find how many CTC loss computation failures will occur
+    count_ctc_failures = int((am_seq_lengths <= target_seq_lengths).sum())
+
+    return count_ctc_failures, am_seq_lengths.tolist(), target_seq_lengths.tolist()
 
 # num_ctc_failures, am_seq_lengths, target_seq_lengths = analyse_ctc_failures_in_model(parakeet_100)
 # print(f"CTC loss will fail for {num_ctc_failures} samples ({num_ctc_failures * 100./ float(len(am_seq_lengths))} % of samples)!\n"
@@ -0,0 +1,119 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from contextlib import nullcontext
+from typing import List, Optional, Sequence
+import torch
+
+DECODERS = ("default", "tdt", "ctc")
+
+def load_asr_model(model_path: str, device: Optional[torch.device] = None):
+    """
+    Restore a `.nemo` checkpoint (e.g. the `save_model_path` of the training scripts) for inference, or a
+    safetensors export of one (`utils.safetensors_checkpoint`), loaded memory-mapped directly on the device.
+    """
+    import nemo.collections.asr as nemo_asr
+    from .safetensors_checkpoint import is_safetensors_checkpoint, load_model
+
+    device = device or (torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu'))
+    if is_safetensors_checkpoint(model_path):
+        model = load_model(model_path, device=device)
+    else:
+        model = nemo_asr.models.ASRModel.restore_from(restore_path=model_path, map_location=device)
+    model.eval()
+    # Inference batches are not augmented
+    model.preprocessor.featurizer.dither = 0.0
+    model.preprocessor.featurizer.pad_to = 0
+    return model
+
+def is_hybrid(model) -> bool:
+    """Hybrid TDT/RNNT-CTC models carry an auxiliary CTC decoder next to the transducer one."""
+    return hasattr(model, "ctc_decoder") and hasattr(model, "ctc_decoding")
+
+def _hypotheses_to_text(hypotheses) -> List[str]:
+    """Decoding returns (best, all) tuples in older NeMo versions and Hypothesis objects or strings in newer ones."""
+    if isinstance(hypotheses, tuple):
+        hypotheses = hypotheses[0]
+    return [h if isinstance(h, str) else h.text for h in hypotheses]
+
+def autocast(device: torch.device, amp: Optional[str]):
+    """bf16/fp16 autocast context for the forward pass, no-op if `amp` is None."""
+    if amp is None:
+        return nullcontext()
+    dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}[amp]
+    return torch.autocast(device_type=device.type, dtype=dtype)
+
+def encode(model, signals: torch.Tensor, lengths: torch.Tensor):
+    """Run the preprocessor and the encoder, returning `(encoded [B, D, T], encoded_len)`."""
+    processed, processed_len = model.preprocessor(input_signal=signals, length=lengths)
+    return model.encoder(audio_signal=processed, length=processed_len)
+
+def ctc_log_probs(model, encoded: torch.Tensor) -> torch.Tensor:
+    """Log-probabilities of the CTC head: the auxiliary one of hybrid models, the main decoder of CTC models."""
+    decoder = model.ctc_decoder if is_hybrid(model) else model.decoder
+    return decoder(encoder_output=encoded)
+
+def decode(model, encoded: torch.Tensor, encoded_len: torch.Tensor, decoder: str = "default") -> List[str]:
+    """
+    Decode encoder outputs to text with the requested head.
+
+    `decoder` is "tdt" (the transducer head of TDT/RNNT models), "ctc" (the CTC head of CTC and hybrid
+    models) or "default" (the model's main head).
+    """
+    if decoder not in DECODERS:
+        raise ValueError(f"decoder must be one of {DECODERS}, got {decoder}")
+    transducer = hasattr(model, "joint")
+    if decoder == "tdt" and not transducer:
+        raise ValueError("This model has no TDT/RNNT decoder")
+    if decoder == "ctc" and transducer and not is_hybrid(model):
+        raise ValueError("This model has no CTC decoder")
+
+    if transducer and decoder != "ctc":
+        hypotheses = model.decoding.rnnt_decoder_predictions_tensor(
+            encoder_output=encoded, encoded_lengths=encoded_len, return_hypotheses=False
+        )
+    else:
+        decoding = model.ctc_decoding if is_hybrid(model) else model.decoding
+        hypotheses = decoding.ctc_decoder_predictions_tensor(
+            ctc_log_probs(model, encoded), decoder_lengths=encoded_len, return_hypotheses=False
+        )
+    return _hypotheses_to_text(hypotheses)
+
+def transcribe_batch(
+    model, signals: torch.Tensor, lengths: torch.Tensor, decoder: str = "default", amp: Optional[str] = None
+) -> List[str]:
+    """Transcribe a padded batch of mono waveforms at the model's sample rate."""
+    device = next(model.parameters()).device
+    with torch.inference_mode(), autocast(device, amp):
+        encoded, encoded_len = encode(model, signals.to(device, non_blocking=True), lengths.to(device, non_blocking=True))
+        return decode(model, encoded.float(), encoded_len, decoder)
+
+def duration_batches(durations: Sequence[float], batch_duration: float, max_batch_size: int) -> List[List[int]]:
+    """
+    Sort utterances by decreasing duration and pack them into batches whose padded size
+    (number of utterances x longest duration) stays within `batch_duration` seconds.
+
+    The longest utterances come first, so an out-of-memory error shows up on the first batch.
+    """
+    order = sorted(range(len(durations)), key=lambda i: durations[i], reverse=True)
+    batches, batch = [], []
+    for i in order:
+        # The first item of a batch is its longest one
+        if batch and ((len(batch) + 1) * durations[batch[0]] > batch_duration or len(batch) == max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
@@ -34,4 +34,5 @@ pip install nemo_toolkit['asr']
 pip install megatron-core
 # Install miscellaneous dependencies
 pip install pydub
-pip install wandb
\ No newline at end of file
+pip install wandb
+pip install safetensors
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.manifest --manifest=<paths to manifests, separated by commas>
+#
+# Builds the binary index of NeMo JSON-lines manifests: the byte offset and length of every non-empty
+# line and a columnar float32 array of the durations, stored in a `<manifest>.index` directory next to
+# the manifest. `Manifest` then serves any line in O(1) from a memory-mapped view of the file, and
+# selects utterances by duration from the array without parsing JSON. The pages are shared through the
+# OS page cache, so data loader workers don't each hold a parsed copy of the manifest.
+from typing import Iterator, Optional
+import argparse
+import json
+import mmap
+import os
+import numpy as np
+
+OFFSETS_FILE = "offsets.npy"
+LENGTHS_FILE = "lengths.npy"
+DURATIONS_FILE = "durations.npy"
+META_FILE = "meta.json"
+
+def default_index_dir(manifest_path: str) -> str:
+    """The index lives next to the manifest, e.g. train-manifest.json -> train-manifest.index/"""
+    return os.path.splitext(manifest_path)[0] + ".index"
+
+def _manifest_meta(manifest_path: str) -> dict:
+    st = os.stat(manifest_path)
+    return {"manifest_size": st.st_size, "manifest_mtime_ns": st.st_mtime_ns}
+
+def index_is_valid(manifest_path: str, index_dir: Optional[str] = None) -> bool:
+    """An index can be reused if it was completely written for the current size and mtime of the manifest."""
+    meta_path = os.path.join(index_dir or default_index_dir(manifest_path), META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    return all(stored.get(k) == v for k, v in _manifest_meta(manifest_path).items())
+
+def build_index(manifest_path: str, index_dir: Optional[str] = None) -> str:
+    """
+    Scan a manifest once and write its line offsets, line lengths (in bytes) and durations.
+
+    Only non-empty lines are indexed, so row `i` of the index is the `i`-th entry of the manifest. The metadata
+    file is written last and marks the index as complete.
+
+    Returns:
+        str: The directory of the index.
+    """
+    index_dir = index_dir or default_index_dir(manifest_path)
+    os.makedirs(index_dir, exist_ok=True)
+    meta = _manifest_meta(manifest_path)
+    offsets, lengths, durations = [], [], []
+    offset = 0
+    with open(manifest_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                offsets.append(offset)
+                lengths.append(len(line.rstrip(b"\r\n")))
+                durations.append(json.loads(line)["duration"])
+            offset += len(line)
+    np.save(os.path.join(index_dir, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(index_dir, LENGTHS_FILE), np.asarray(lengths, dtype=np.int32))
+    np.save(os.path.join(index_dir, DURATIONS_FILE), np.asarray(durations, dtype=np.float32))
+    with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({**meta, "num_entries": len(offsets), "total_duration": float(sum(durations))}, f)
+    return index_dir
+
+class Manifest:
+    """
+    Random access, read-only view of a JSON-lines manifest backed by its index.
+
+    The index is built on first use (or when the manifest changed) and the manifest and index arrays are
+    memory-mapped lazily in each process, so the object is cheap to pickle into data loader workers.
+    `rows` restricts the view to a subset of the entries, see `filter_duration`.
+    """
+    def __init__(self, manifest_path: str, index_dir: Optional[str] = None, rows: Optional[np.ndarray] = None):
+        self.manifest_path = manifest_path
+        self.index_dir = index_dir or default_index_dir(manifest_path)
+        if not index_is_valid(manifest_path, self.index_dir):
+            build_index(manifest_path, self.index_dir)
+        self.rows = rows
+        self._mmap = None
+        self._arrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_mmap"] = None
+        state["_arrays"] = None
+        return state
+
+    def _columns(self):
+        if self._arrays is None:
+            self._arrays = tuple(
+                np.load(os.path.join(self.index_dir, name), mmap_mode="r")
+                for name in (OFFSETS_FILE, LENGTHS_FILE, DURATIONS_FILE)
+            )
+        return self._arrays
+
+    @property
+    def durations(self) -> np.ndarray:
+        """Durations of the entries of the view, in seconds."""
+        durations = self._columns()[2]
+        return durations if self.rows is None else durations[self.rows]
+
+    def __len__(self):
+        return len(self._columns()[0]) if self.rows is None else len(self.rows)
+
+    def line(self, idx: int) -> bytes:
+        """Raw bytes of the `idx`-th entry, without the line terminator."""
+        if self._mmap is None:
+            with open(self.manifest_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets, lengths, _ = self._columns()
+        row = idx if self.rows is None else self.rows[idx]
+        offset = int(offsets[row])
+        return self._mmap[offset:offset + int(lengths[row])]
+
+    def __getitem__(self, idx: int) -> dict:
+        return json.loads(self.line(idx))
+
+    def __iter__(self) -> Iterator[dict]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def filter_duration(self, min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> "Manifest":
+        """View of the entries within [min_duration, max_duration], selected from the duration column only."""
+        durations = self.durations
+        keep = np.ones(len(durations), dtype=bool)
+        if min_duration is not None:
+            keep &= durations >= np.float32(min_duration)
+        if max_duration is not None:
+            keep &= durations <= np.float32(max_duration)
+        rows = np.flatnonzero(keep) if self.rows is None else self.rows[keep]
+        return Manifest(self.manifest_path, self.index_dir, rows=rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the binary offset/duration index of manifests")
+    parser.add_argument("--manifest", required=True, type=str, help="Comma separated list of manifest files")
+    parser.add_argument("--force", action="store_true", help="Rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    for manifest_path in args.manifest.split(","):
+        if args.force or not index_is_valid(manifest_path):
+            build_index(manifest_path)
+        manifest = Manifest(manifest_path)
+        print(f"{manifest_path}: {len(manifest)} entries, {float(manifest.durations.sum()) / 3600:.2f} h")
+
+if __name__ == "__main__":
+    main()
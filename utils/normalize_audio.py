@@ -0,0 +1,210 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.normalize_audio --manifest=<paths to manifests, separated by commas> \
+#         --cache_dir="<output directory>" \
+#         --sample_rate=16000 \
+#         --format=wav
+#
+# Converts the audio of every manifest entry to mono 16-bit PCM at the target sample rate (WAV or FLAC) in
+# a process pool and writes the result to a cache directory, leaving the source files untouched. Outputs
+# are named after the source path, size and mtime, so unchanged files are not converted again on the next
+# run. An updated manifest pointing at the converted files, with their exact durations, is written to
+# `<cache_dir>/<manifest name>-<hash of its path>.json`. Train from it by adding a `normalize_audio: {dir: <cache_dir>}`
+# section to a data loader in the YAML config (see `apply_normalize_audio_config`).
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+import argparse
+import hashlib
+import json
+import os
+import librosa
+import numpy as np
+import soundfile as sf
+from omegaconf import DictConfig, open_dict
+from pydub import AudioSegment
+
+FORMATS = {"wav": "WAV", "flac": "FLAC"}
+
+def normalized_path(audio_path: str, cache_dir: str, sample_rate: int, audio_format: str) -> str:
+    """Location of the converted copy of an audio, keyed by its path, size, mtime and the target format."""
+    st = os.stat(audio_path)
+    key = json.dumps([os.path.abspath(audio_path), st.st_size, st.st_mtime_ns, sample_rate, audio_format])
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    name = os.path.splitext(os.path.basename(audio_path))[0]
+    # Two-level fan out keeps directories small for datasets with millions of files
+    return os.path.join(cache_dir, digest[:2], f"{name}-{digest[:12]}.{audio_format}")
+
+def normalized_manifest_path(manifest_path: str, cache_dir: str) -> str:
+    """
+    Default location of the updated manifest, keyed by the source manifest path so manifests with the same
+    name in different directories, or from other runs sharing the cache, don't overwrite each other.
+    """
+    digest = hashlib.sha1(os.path.abspath(manifest_path).encode()).hexdigest()[:12]
+    name, ext = os.path.splitext(os.path.basename(manifest_path))
+    return os.path.join(cache_dir, f"{name}-{digest}{ext or '.json'}")
+
+def _decode(audio_path: str):
+    """Decode to a float32 [num_frames, channels] array, with pydub for formats libsndfile can't read."""
+    try:
+        return sf.read(audio_path, dtype="float32", always_2d=True)
+    except RuntimeError:
+        audio = AudioSegment.from_file(audio_path)
+        samples = np.asarray(audio.get_array_of_samples(), dtype=np.float32) / (1 << (8 * audio.sample_width - 1))
+        return samples.reshape(-1, audio.channels), audio.frame_rate
+
+def _normalize_file(job) -> Dict[str, Any]:
+    """Worker: convert one audio, or only read the duration of its cached copy."""
+    audio_path, output_path, sample_rate, audio_format = job
+    try:
+        if os.path.exists(output_path):
+            return {"path": audio_path, "output": output_path, "status": "cached", "duration": sf.info(output_path).duration}
+        audio, sr = _decode(audio_path)
+        audio = audio.mean(axis=1)
+        if sr != sample_rate:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Written next to the target and renamed, an interrupted run never leaves a truncated file in the cache
+        tmp_path = f"{output_path}.tmp"
+        sf.write(tmp_path, np.clip(audio, -1.0, 1.0), sample_rate, subtype="PCM_16", format=FORMATS[audio_format])
+        os.replace(tmp_path, output_path)
+        return {"path": audio_path, "output": output_path, "status": "converted", "duration": len(audio) / sample_rate}
+    except Exception as e:
+        return {"path": audio_path, "status": "error", "error": str(e)}
+
+def normalize_manifest(
+    manifest_path: str,
+    cache_dir: str,
+    output_manifest: Optional[str] = None,
+    sample_rate: int = 16000,
+    audio_format: str = "wav",
+    num_workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Dict[str, Any]:
+    """
+    Convert the audios of a manifest to mono 16-bit PCM at `sample_rate` in `cache_dir` and write the manifest
+    of the converted files.
+
+    Args:
+        manifest_path (str): Path to a NeMo JSON-lines manifest.
+        cache_dir (str): Directory receiving the converted audios.
+        output_manifest (str, optional): Path of the updated manifest, defaults to `normalized_manifest_path`.
+        sample_rate (int): Target sample rate.
+        audio_format (str): `wav` or `flac`.
+        num_workers (int, optional): Size of the process pool, defaults to the number of CPUs.
+        chunksize (int): Number of files handed to a worker at a time.
+
+    Returns:
+        dict: A summary report with the number of entries converted, served from the cache and failed, the
+            failed paths and the path of the updated manifest. Failed entries are left out of the manifest.
+    """
+    if audio_format not in FORMATS:
+        raise ValueError(f"Unsupported format {audio_format}, expected one of {list(FORMATS)}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    audio_paths = list(dict.fromkeys(entry["audio_filepath"] for entry in entries))
+    jobs = []
+    errors = []
+    for audio_path in audio_paths:
+        try:
+            jobs.append((audio_path, normalized_path(audio_path, cache_dir, sample_rate, audio_format), sample_rate, audio_format))
+        except OSError as e:
+            errors.append({"path": audio_path, "status": "error", "error": str(e)})
+
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers > 1 and len(jobs) > chunksize:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_normalize_file, jobs, chunksize=chunksize))
+    else:
+        results = [_normalize_file(job) for job in jobs]
+    results = {result["path"]: result for result in results + errors}
+
+    output_manifest = output_manifest or normalized_manifest_path(manifest_path, cache_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(output_manifest)), exist_ok=True)
+    with open(output_manifest, "w", encoding="utf-8") as f:
+        for entry in entries:
+            result = results[entry["audio_filepath"]]
+            if result["status"] == "error":
+                continue
+            f.write(json.dumps({**entry, "audio_filepath": os.path.abspath(result["output"]), "duration": result["duration"]}, ensure_ascii=False) + "\n")
+
+    report = {
+        "manifest": manifest_path,
+        "output_manifest": output_manifest,
+        "num_files": len(audio_paths),
+        "num_converted": sum(1 for r in results.values() if r["status"] == "converted"),
+        "num_cached": sum(1 for r in results.values() if r["status"] == "cached"),
+        "num_errors": sum(1 for r in results.values() if r["status"] == "error"),
+        "errors": [(r["path"], r["error"]) for r in results.values() if r["status"] == "error"],
+    }
+    print(
+        f"Normalized {report['num_files']} audios of {manifest_path} to {sample_rate} Hz mono {audio_format} "
+        f"({report['num_cached']} from cache, {report['num_errors']} errors): {output_manifest}"
+    )
+    return report
+
+def apply_normalize_audio_config(loader_config: DictConfig, convert: bool = True) -> DictConfig:
+    """
+    Switch a data loader section of the YAML config to normalized copies of its audios.
+
+    Does nothing unless the section has a `normalize_audio` sub-section, e.g.:
+
+        normalize_audio:
+          dir: "bam-asr-all/normalized"  # cache directory of the converted audios
+          format: "wav"                  # or "flac"
+
+    The audios are converted to the loader's `sample_rate` with `normalize_manifest` (only new or modified
+    files are converted) and `manifest_filepath` is replaced by the updated manifest, so the data loaders
+    never resample or downmix on the fly and the source files are not modified. With `convert=False` only
+    the config is rewritten, for the distributed ranks reading the manifest written by rank 0.
+    """
+    normalize_config = loader_config.get("normalize_audio", None)
+    if normalize_config is None:
+        return loader_config
+
+    output_manifest = normalized_manifest_path(loader_config.manifest_filepath, normalize_config.dir)
+    if convert:
+        normalize_manifest(
+            loader_config.manifest_filepath,
+            normalize_config.dir,
+            output_manifest=output_manifest,
+            sample_rate=loader_config.get("sample_rate", 16000),
+            audio_format=normalize_config.get("format", "wav"),
+            num_workers=normalize_config.get("num_workers", None),
+        )
+    with open_dict(loader_config):
+        loader_config.pop("normalize_audio")
+        loader_config.manifest_filepath = output_manifest
+    return loader_config
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert manifest audios to mono 16-bit PCM in a cache directory")
+    parser.add_argument("--manifest", required=True, type=str, help="Comma separated list of manifest files")
+    parser.add_argument("--cache_dir", required=True, type=str, help="Directory receiving the converted audios and manifests")
+    parser.add_argument("--sample_rate", default=16000, type=int, help="Target sample rate")
+    parser.add_argument("--format", default="wav", choices=list(FORMATS), help="Output audio format")
+    parser.add_argument("--num_workers", default=None, type=int, help="Number of files converted in parallel")
+    args = parser.parse_args()
+
+    for manifest_path in args.manifest.split(","):
+        report = normalize_manifest(
+            manifest_path, args.cache_dir, sample_rate=args.sample_rate, audio_format=args.format,
+            num_workers=args.num_workers,
+        )
+        for path, error in report["errors"][:10]:
+            print(f"  {path}: {error}")
+
+if __name__ == "__main__":
+    main()
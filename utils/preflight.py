@@ -0,0 +1,250 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.preflight --config=configs/parakeet-110m-config-v6.yaml
+#
+# Validates a training config without importing torch, NeMo or Lightning: required keys and unset `???`
+# values, manifests (readable, first entry well formed, first audio present), tokenizer files, the warm
+# start checkpoint and the output, checkpoint and cache directories. `train.py` runs these checks before any
+# heavy import or model download, so a misconfigured job fails in well under a second. Keep the imports of
+# this module to the standard library and omegaconf.
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import time
+from omegaconf import DictConfig, ListConfig, OmegaConf
+
+# Keys read unconditionally by the training pipeline
+REQUIRED_KEYS = (
+    "model.name",
+    "tokenizer.type",
+    "data_loaders.train.manifest_filepath",
+    "data_loaders.valid.manifest_filepath",
+    "optim.name",
+    "wandb.project",
+    "wandb.name",
+    "training.freeze_encoder",
+    "training.checkpoint_dir",
+    "training.save_top_k",
+    "training.patience",
+    "training.epochs",
+    "training.precision",
+    "training.accumulate_grad_batches",
+    "training.check_val_every_n_epoch",
+    "training.resume_if_exists",
+    "training.resume_ignore_no_checkpoint",
+    "training.save_model_path",
+)
+
+# Files a tokenizer directory must contain, by tokenizer type
+TOKENIZER_FILES = {"bpe": "tokenizer.model", "wpe": "vocab.txt"}
+
+# Index of a safetensors export, see utils.safetensors_checkpoint (not imported here, it needs torch)
+SAFETENSORS_INDEX = "model.safetensors.index.json"
+
+LOADERS = ("train", "valid", "test")
+CACHES = ("feature_cache", "encoder_cache", "token_cache")
+
+class PhaseTimer:
+    """Wall-clock time of the startup and training phases, reported as they end and summarized at the end."""
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            print(f"[timing] {name}: {self.phases[name]:.2f}s")
+
+    def report(self) -> None:
+        print("[timing] summary:")
+        for name, seconds in self.phases.items():
+            print(f"  {name:<20} {seconds:10.2f}s")
+        print(f"  {'total':<20} {sum(self.phases.values()):10.2f}s")
+
+def _paths(value) -> List[str]:
+    """Manifest paths of a loader: a list or a comma separated string."""
+    if isinstance(value, (list, ListConfig)):
+        return [str(path) for path in value]
+    return [path.strip() for path in str(value).split(",") if path.strip()]
+
+def _writable(path: str) -> bool:
+    """Whether `path` can be created or written: the path itself if it exists, else its closest existing parent."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+    return os.access(path, os.W_OK)
+
+def check_keys(config: DictConfig) -> List[str]:
+    """Unset (`???`) values anywhere in the config and absent required keys."""
+    missing = OmegaConf.missing_keys(config)
+    problems = [f"{key} is not set (???)" for key in sorted(missing)]
+    for key in REQUIRED_KEYS:
+        if key not in missing and OmegaConf.select(config, key, default=None) is None:
+            problems.append(f"{key} is missing")
+    return problems
+
+def check_manifest(manifest_path: str) -> Optional[str]:
+    """Check a manifest exists and its first entry has an existing audio, a duration and a transcript."""
+    if not os.path.isfile(manifest_path):
+        return f"manifest {manifest_path} not found"
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        line = next((line for line in f if line.strip()), None)
+    if line is None:
+        return f"manifest {manifest_path} is empty"
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError as e:
+        return f"manifest {manifest_path} is not JSON lines: {e}"
+    missing = [key for key in ("audio_filepath", "duration", "text") if key not in entry]
+    if missing:
+        return f"manifest {manifest_path} entries lack {', '.join(missing)}"
+    audio_path = entry["audio_filepath"]
+    # NeMo also resolves audio paths relative to the manifest's directory
+    relative = os.path.join(os.path.dirname(manifest_path), audio_path)
+    if not os.path.exists(audio_path) and not os.path.exists(relative):
+        return f"manifest {manifest_path}: audio {audio_path} of the first entry not found"
+    return None
+
+def check_data(config: DictConfig) -> List[str]:
+    """Manifests, tarred shards and cache directories of the data loaders."""
+    problems = []
+    data_loaders = config.get("data_loaders", None) or {}
+    for name in LOADERS:
+        loader_config = data_loaders.get(name, None)
+        if loader_config is None:
+            continue
+        tarred_dir = loader_config.get("tarred_dir", None)
+        if tarred_dir:
+            if not os.path.isdir(tarred_dir):
+                problems.append(f"data_loaders.{name}.tarred_dir {tarred_dir} not found")
+            continue
+        if OmegaConf.is_missing(loader_config, "manifest_filepath"):
+            continue
+        manifests = loader_config.get("manifest_filepath", None)
+        if manifests is None:
+            continue
+        for manifest_path in _paths(manifests):
+            problem = check_manifest(manifest_path)
+            if problem:
+                problems.append(f"data_loaders.{name}: {problem}")
+        normalize_config = loader_config.get("normalize_audio", None)
+        if normalize_config is not None and not _writable(normalize_config.get("dir", "")):
+            problems.append(f"data_loaders.{name}.normalize_audio.dir {normalize_config.get('dir', None)} is not writable")
+    return problems
+
+def check_model(config: DictConfig) -> List[str]:
+    """The warm start checkpoint, when restored from a local .nemo file or a safetensors export."""
+    model_config = config.get("model", None)
+    if model_config is None or OmegaConf.is_missing(model_config, "name") or model_config.get("name", None) is None:
+        return []
+    source = model_config.get("source", "auto")
+    if source not in ("auto", "pretrained", "restore", "safetensors"):
+        return [f"model.source {source} is not one of pretrained, restore, safetensors or auto"]
+    name = str(model_config.name)
+    if source == "safetensors" or (source == "auto" and os.path.isdir(name)):
+        if not os.path.isfile(os.path.join(name, SAFETENSORS_INDEX)):
+            return [f"model.name: {os.path.join(name, SAFETENSORS_INDEX)} not found"]
+        return []
+    if (source == "restore" or (source == "auto" and name.endswith(".nemo"))) and not os.path.isfile(name):
+        return [f"model.name {name} not found"]
+    return []
+
+def check_tokenizer(config: DictConfig) -> List[str]:
+    """Tokenizer type and files, when the vocabulary is changed or token IDs are cached."""
+    tokenizer_config = config.get("tokenizer", None)
+    if tokenizer_config is None or OmegaConf.is_missing(tokenizer_config, "type"):
+        return []
+    tokenizer_type = tokenizer_config.get("type", None)
+    if tokenizer_type == "char":
+        return []
+    if tokenizer_type not in TOKENIZER_FILES:
+        return [f"tokenizer.type {tokenizer_type} is not one of bpe, wpe or char"]
+    token_cache = OmegaConf.select(config, "training.token_cache.enabled", default=False)
+    if not config.get("model", {}).get("change_vocabulary", True) and not token_cache:
+        return []
+    if OmegaConf.is_missing(tokenizer_config, "path"):
+        # Already reported by check_keys
+        return []
+    path = tokenizer_config.get("path", None)
+    if not path:
+        return [f"tokenizer.path is required for {tokenizer_type} tokenizers"]
+    tokenizer_file = os.path.join(path, TOKENIZER_FILES[tokenizer_type])
+    if not os.path.isfile(tokenizer_file):
+        return [f"tokenizer.path: {tokenizer_file} not found"]
+    return []
+
+def check_outputs(config: DictConfig) -> List[str]:
+    """Checkpoint, cache and final model locations must be writable, resumed checkpoints must exist."""
+    training_config = config.get("training", None)
+    if training_config is None:
+        return []
+    problems = []
+    checkpoint_dir = OmegaConf.select(training_config, "checkpoint_dir", default=None)
+    if checkpoint_dir:
+        if os.path.exists(checkpoint_dir) and not os.path.isdir(checkpoint_dir):
+            problems.append(f"training.checkpoint_dir {checkpoint_dir} is not a directory")
+        elif not _writable(checkpoint_dir):
+            problems.append(f"training.checkpoint_dir {checkpoint_dir} is not writable")
+        elif (
+            training_config.get("resume_if_exists", False)
+            and not training_config.get("resume_ignore_no_checkpoint", False)
+            and not os.path.isdir(checkpoint_dir)
+        ):
+            problems.append(f"training.resume_if_exists is set but {checkpoint_dir} doesn't exist")
+    save_model_path = OmegaConf.select(training_config, "save_model_path", default=None)
+    if save_model_path:
+        if os.path.isdir(save_model_path):
+            problems.append(f"training.save_model_path {save_model_path} is a directory")
+        elif not _writable(save_model_path):
+            problems.append(f"training.save_model_path {save_model_path} is not writable")
+    for cache in CACHES:
+        cache_config = training_config.get(cache, None)
+        if cache_config is not None and cache_config.get("enabled", False) and not _writable(cache_config.get("dir", "")):
+            problems.append(f"training.{cache}.dir {cache_config.get('dir', None)} is not writable")
+    return problems
+
+def preflight(config: DictConfig) -> None:
+    """
+    Run every check on the config and raise a ValueError listing all the problems found, if any.
+
+    Only reads the config and the file system, so it can run before torch, NeMo and Lightning are imported
+    and before the model is downloaded.
+    """
+    problems = []
+    for check in (check_keys, check_model, check_tokenizer, check_data, check_outputs):
+        problems.extend(check(config))
+    if problems:
+        raise ValueError("Pre-flight checks failed:\n  - " + "\n  - ".join(problems))
+    print("Pre-flight checks passed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a training config before launching a job")
+    parser.add_argument("--config", required=True, type=str, help="Training YAML config")
+    args = parser.parse_args()
+
+    timer = PhaseTimer()
+    with timer.phase("preflight"):
+        preflight(OmegaConf.load(args.config))
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,17 @@ This script downloads the 'mutisya/sabian' dataset from Hugging Face,
 and prepares it for NeMo ASR training. It creates:
 1. Manifest files (train, validation, test) in .json format.
 2. A single text file containing all training transcriptions for tokenizer creation.
+
+All splits are processed in a single pass: audio durations are read from the file headers
+in a worker pool, and the tokenizer corpus is written alongside the train manifest.
+Interrupted runs can be resumed, already written manifest entries are kept.
 """
 import os
 import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import librosa
+import soundfile as sf
 from datasets import load_dataset, Audio
 from tqdm import tqdm
 import warnings
@@ -14,73 +21,138 @@ import warnings
 # Suppress warnings from librosa about audioread
 warnings.filterwarnings("ignore", category=UserWarning, module='librosa')
 
-def create_manifest(dataset, manifest_path):
-    """Creates a NeMo-compatible manifest file from a Hugging Face dataset split."""
+# Number of items submitted to the worker pool at once, bounds the memory used per split
+CHUNK_SIZE = 1024
+
+def get_duration(audio_path):
+    """Read the duration from the audio header, falling back to librosa for formats soundfile can't open."""
+    try:
+        return sf.info(audio_path).duration
+    except RuntimeError:
+        return librosa.get_duration(path=audio_path)
+
+def _manifest_entry(item):
+    """Worker: build a manifest entry from an (audio_path, text) pair, None if the audio is unusable."""
+    audio_path, text = item
+    # NeMo requires absolute paths in manifests
+    abs_audio_path = os.path.abspath(audio_path)
+    if not os.path.exists(abs_audio_path):
+        print(f"Warning: Audio file not found at {abs_audio_path}. Skipping.")
+        return None
+    try:
+        duration = get_duration(abs_audio_path)
+    except Exception as e:
+        print(f"Error processing item: {audio_path}. Error: {e}")
+        return None
+    return {
+        'audio_filepath': abs_audio_path,
+        'duration': duration,
+        'text': text
+    }
+
+def _load_partial_manifest(manifest_path):
+    """
+    Return the audio paths and texts already written to a manifest, dropping a truncated last line.
+    """
+    done, texts = set(), []
+    if not os.path.exists(manifest_path):
+        return done, texts
+
+    with open(manifest_path, 'rb+') as f:
+        data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            # The previous run was interrupted in the middle of a line
+            f.truncate(len(complete))
+
+    for line in complete.decode('utf-8').splitlines():
+        entry = json.loads(line)
+        done.add(entry['audio_filepath'])
+        texts.append(entry['text'])
+    return done, texts
+
+def create_manifest(dataset, manifest_path, executor, text_path=None, resume=True):
+    """
+    Creates a NeMo-compatible manifest file from a Hugging Face dataset split.
+
+    Durations are computed by `executor` in chunks of CHUNK_SIZE items, so memory stays bounded
+    whatever the size of the split. When `text_path` is given, the transcripts of the written entries
+    are also saved there for tokenizer training.
+    """
     os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
-    
-    with open(manifest_path, 'w', encoding='utf-8') as fout:
-        for item in tqdm(dataset, desc=f"Processing {os.path.basename(manifest_path)}"):
-            try:
-                # The 'audio' feature in Hugging Face datasets provides the path
-                audio_path = item['audio']['path']
-                
-                # NeMo requires absolute paths in manifests
-                abs_audio_path = os.path.abspath(audio_path)
-                
-                if not os.path.exists(abs_audio_path):
-                    print(f"Warning: Audio file not found at {abs_audio_path}. Skipping.")
-                    continue
-
-                # Get audio duration using librosa
-                duration = librosa.get_duration(path=abs_audio_path)
-                
-                # Get the transcript
-                text = item['sentence']
-
-                # Create a JSON entry for the manifest
-                entry = {
-                    'audio_filepath': abs_audio_path,
-                    'duration': duration,
-                    'text': text
-                }
-                fout.write(json.dumps(entry) + '\n')
-            except Exception as e:
-                print(f"Error processing item: {item}. Error: {e}")
-
-
-def prepare_text_for_tokenizer(dataset, text_path):
-    """Extracts all transcripts into a single text file for tokenizer training."""
-    os.makedirs(os.path.dirname(text_path), exist_ok=True)
-    with open(text_path, 'w', encoding='utf-8') as f:
-        for item in tqdm(dataset, desc="Writing text corpus for tokenizer"):
-            f.write(item['sentence'] + '\n')
+
+    done, texts = _load_partial_manifest(manifest_path) if resume else (set(), [])
+    if done:
+        print(f"Resuming {manifest_path}: {len(done)} entries already written")
+
+    text_file = None
+    if text_path is not None:
+        os.makedirs(os.path.dirname(text_path), exist_ok=True)
+        # The corpus is rebuilt from the kept entries so it always matches the manifest
+        text_file = open(text_path, 'w', encoding='utf-8')
+        text_file.writelines(text + '\n' for text in texts)
+
+    items = (
+        (item['audio']['path'], item['sentence']) for item in dataset
+        if os.path.abspath(item['audio']['path']) not in done
+    )
+    try:
+        with open(manifest_path, 'a' if done else 'w', encoding='utf-8') as fout, \
+                tqdm(total=len(dataset), initial=len(done), desc=f"Processing {os.path.basename(manifest_path)}") as pbar:
+            while True:
+                chunk = list(itertools.islice(items, CHUNK_SIZE))
+                if not chunk:
+                    break
+                for entry in executor.map(_manifest_entry, chunk, chunksize=32):
+                    if entry is None:
+                        continue
+                    fout.write(json.dumps(entry) + '\n')
+                    if text_file is not None:
+                        text_file.write(entry['text'] + '\n')
+                fout.flush()
+                pbar.update(len(chunk))
+    finally:
+        if text_file is not None:
+            text_file.close()
+
 
 if __name__ == "__main__":
     # --- Configuration ---
     dataset_name = "mutisya/sabian"
     output_dir = "sabian_dataset"
-    sample_rate = 16000
+    num_workers = os.cpu_count() or 1
     
     # --- Main Logic ---
     print(f"Loading '{dataset_name}' dataset from Hugging Face...")
     # This will download and cache the dataset. 
-    # We cast the audio feature to ensure it's loaded at the correct sample rate.
+    # Audio decoding is disabled, only the file paths and transcripts are needed to write the manifests.
     sabian_dataset = load_dataset(dataset_name)
-    sabian_dataset = sabian_dataset.cast_column("audio", Audio(sampling_rate=sample_rate))
+    sabian_dataset = sabian_dataset.cast_column("audio", Audio(decode=False))
+    sabian_dataset = sabian_dataset.select_columns(["audio", "sentence"])
 
 
     # Create directories for manifests and tokenizer data
     manifests_dir = os.path.join(output_dir, "manifests")
     tokenizer_data_dir = os.path.join(output_dir, "tokenizer_data")
-    
-    # Create manifests for each split
-    create_manifest(sabian_dataset['train'], os.path.join(manifests_dir, 'train_manifest.json'))
-    create_manifest(sabian_dataset['validation'], os.path.join(manifests_dir, 'validation_manifest.json'))
-    create_manifest(sabian_dataset['test'], os.path.join(manifests_dir, 'test_manifest.json'))
-    
-    # Prepare a single text file from the training data to train the tokenizer
     all_text_path = os.path.join(tokenizer_data_dir, 'all_text.txt')
-    prepare_text_for_tokenizer(sabian_dataset['train'], all_text_path)
+
+    # Create manifests for each split, sharing one worker pool. The text file from the
+    # training data used to train the tokenizer is written in the same pass as the train manifest.
+    splits = {
+        'train': ('train_manifest.json', all_text_path),
+        'validation': ('validation_manifest.json', None),
+        'test': ('test_manifest.json', None),
+    }
+    with ProcessPoolExecutor(max_workers=num_workers) as executor, ThreadPoolExecutor(max_workers=len(splits)) as writers:
+        futures = [
+            writers.submit(
+                create_manifest, sabian_dataset[split], os.path.join(manifests_dir, manifest_name),
+                executor, text_path=text_path
+            )
+            for split, (manifest_name, text_path) in splits.items()
+        ]
+        for future in futures:
+            future.result()
     
     print("\n--- Summary ---")
     print(f"Manifests created in: {manifests_dir}")
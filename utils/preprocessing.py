@@ -12,10 +12,18 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and  
 limitations under the License.
 """
-from typing import Any
+from typing import Any, Dict, Optional
 import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
 from omegaconf import DictConfig, OmegaConf
 from pydub import AudioSegment
+from .audio_metadata import AudioMetadataCache, audio_fingerprint, default_cache_path
+
+# RF64 is the 64-bit RIFF variant used by some recorders for files larger than 4GB
+_RIFF_MAGICS = (b"RIFF", b"RF64")
+_FLAC_MAGIC = b"fLaC"
 
 def _omegaconf_to_container(obj: Any) -> Any:
     """Recursively convert DictConfig objects into plain dicts/lists so they're JSON-serializable."""
@@ -28,6 +36,81 @@ def _omegaconf_to_container(obj: Any) -> Any:
         return {k: _omegaconf_to_container(v) for k, v in obj.items()}
     return obj
 
+def _read_wav_header(f) -> Optional[Dict[str, int]]:
+    """Walk the RIFF chunks of an open WAV file up to the data chunk."""
+    channels = sample_rate = block_align = None
+    data_size = None
+    f.seek(12)
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            _, channels, sample_rate, _, block_align = struct.unpack("<HHIIH", fmt[:14])
+            # Chunks are word aligned
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b"ds64":
+            # RF64 stores the real data size in the ds64 chunk
+            ds64 = f.read(chunk_size)
+            data_size = struct.unpack("<Q", ds64[8:16])[0]
+        elif chunk_id == b"data":
+            if data_size is None or chunk_size != 0xFFFFFFFF:
+                data_size = chunk_size
+            break
+        else:
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    if channels is None or data_size is None or not block_align:
+        return None
+    return {"channels": channels, "sample_rate": sample_rate, "num_frames": data_size // block_align}
+
+def _read_flac_header(f) -> Optional[Dict[str, int]]:
+    """Decode the STREAMINFO metadata block that must follow the fLaC marker."""
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None
+    streaminfo = f.read(34)
+    if len(streaminfo) < 34:
+        return None
+    # Bytes 10-17: 20 bits sample rate, 3 bits (channels - 1), 5 bits (bps - 1), 36 bits total samples
+    packed = int.from_bytes(streaminfo[10:18], "big")
+    return {
+        "channels": ((packed >> 41) & 0x7) + 1,
+        "sample_rate": packed >> 44,
+        "num_frames": packed & 0xFFFFFFFFF,
+    }
+
+def read_audio_header(file_path: str) -> Optional[Dict[str, int]]:
+    """
+    Read channel count, sample rate and frame count from a WAV or FLAC header without decoding the audio.
+
+    Returns None when the file is in another container format or the header can't be parsed.
+    """
+    with open(file_path, "rb") as f:
+        magic = f.read(4)
+        if magic in _RIFF_MAGICS:
+            f.seek(8)
+            if f.read(4) != b"WAVE":
+                return None
+            return _read_wav_header(f)
+        if magic == _FLAC_MAGIC:
+            return _read_flac_header(f)
+    return None
+
+def probe_audio(file_path: str) -> Dict[str, int]:
+    """Return header info for an audio file, decoding it with pydub only if the header can't be read."""
+    info = read_audio_header(file_path)
+    if info is None:
+        audio = AudioSegment.from_file(file_path)
+        info = {
+            "channels": audio.channels,
+            "sample_rate": audio.frame_rate,
+            "num_frames": int(audio.frame_count()),
+        }
+    return info
+
 def convert_to_mono(file_path):
     """Convert an audio file to mono if it has multiple channels."""
     audio = AudioSegment.from_file(file_path)
@@ -35,14 +118,101 @@ def convert_to_mono(file_path):
         audio = audio.set_channels(1)
         audio.export(file_path, format="wav")
 
-def check_and_convert_audio_channels(manifest_path):
-    """Check the number of channels in audio files and convert to mono if necessary."""
+def _check_audio_file(audio_path: str) -> Dict[str, Any]:
+    """Worker: probe one file and convert it to mono (decoding it once) if needed."""
+    try:
+        info = probe_audio(audio_path)
+        status = "ok"
+        if info["channels"] > 1:
+            convert_to_mono(audio_path)
+            info["channels"] = 1
+            status = "converted"
+        size, mtime_ns = AudioMetadataCache.stat(audio_path)
+        return {
+            "path": audio_path, "status": status, "size": size, "mtime_ns": mtime_ns,
+            "fingerprint": audio_fingerprint(audio_path), **info,
+        }
+    except Exception as e:
+        return {"path": audio_path, "status": "error", "error": str(e)}
+
+def check_and_convert_audio_channels(manifest_path, num_workers=None, chunksize=64, cache_path=None, use_cache=True):
+    """
+    Check the number of channels in audio files and convert to mono if necessary.
+
+    Only the WAV/FLAC headers are read (other formats fall back to a pydub decode) and the scan is fanned out
+    over a process pool. Files with more than one channel are decoded once and rewritten as mono WAV.
+    Results are stored in an `AudioMetadataCache` next to the manifest, so files whose size and mtime haven't
+    changed since the previous launch are not scanned again.
+
+    Args:
+        manifest_path (str): Path to a NeMo JSON-lines manifest.
+        num_workers (int, optional): Size of the process pool, defaults to the number of CPUs.
+        chunksize (int): Number of files handed to a worker at a time.
+        cache_path (str, optional): Location of the metadata cache, defaults to `default_cache_path(manifest_path)`.
+        use_cache (bool): Set to False to force a full rescan without reading or writing the cache.
+
+    Returns:
+        dict: A summary report with the number of manifest entries, and over the distinct audio files: the
+            number of files, served from the cache, converted and failed, the sample rates seen, the total
+            duration in seconds and the lists of converted and failed paths (with their errors).
+    """
     with open(manifest_path, 'r', encoding="utf-8") as f:
-        lines = f.readlines()
+        entry_paths = [json.loads(line)['audio_filepath'] for line in f if line.strip()]
+    # Manifests may reference the same file more than once, every count is over distinct files
+    audio_paths = list(dict.fromkeys(entry_paths))
 
-    for line in lines:
-        audio_path = json.loads(line)['audio_filepath']
-        audio = AudioSegment.from_file(audio_path)
-        if audio.channels > 1:
-            convert_to_mono(audio_path)
-    print(f"All stereo audios in {manifest_path} have been converted to mono")
+    report = {
+        "manifest": manifest_path,
+        "num_entries": len(entry_paths),
+        "num_files": len(audio_paths),
+        "num_cached": 0,
+        "num_converted": 0,
+        "num_errors": 0,
+        "sample_rates": {},
+        "total_duration": 0.0,
+        "converted": [],
+        "errors": [],
+    }
+
+    cache = AudioMetadataCache(cache_path or default_cache_path(manifest_path)) if use_cache else None
+    cached = cache.get_many(audio_paths) if cache is not None else {}
+    to_scan = [path for path in audio_paths if path not in cached]
+
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers > 1 and len(to_scan) > chunksize:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_check_audio_file, to_scan, chunksize=chunksize))
+    else:
+        results = [_check_audio_file(path) for path in to_scan]
+
+    if cache is not None:
+        cache.put_many(result for result in results if result["status"] != "error")
+        cache.close()
+
+    report["num_cached"] = len(cached)
+    for info in cached.values():
+        report["sample_rates"][info["sample_rate"]] = report["sample_rates"].get(info["sample_rate"], 0) + 1
+        report["total_duration"] += info["duration"]
+
+    for result in results:
+        if result["status"] == "error":
+            report["num_errors"] += 1
+            report["errors"].append((result["path"], result["error"]))
+            continue
+        if result["status"] == "converted":
+            report["num_converted"] += 1
+            report["converted"].append(result["path"])
+        sample_rate = result["sample_rate"]
+        report["sample_rates"][sample_rate] = report["sample_rates"].get(sample_rate, 0) + 1
+        if sample_rate:
+            report["total_duration"] += result["num_frames"] / sample_rate
+
+    print(
+        f"Checked {report['num_files']} audios in {manifest_path} ({report['num_cached']} from cache): "
+        f"{report['num_converted']} converted to mono, {report['num_errors']} errors"
+    )
+    for path, error in report["errors"][:20]:
+        print(f"  failed: {path}: {error}")
+    if len(report["errors"]) > 20:
+        print(f"  ... {len(report['errors']) - 20} more, see the returned report")
+    return report
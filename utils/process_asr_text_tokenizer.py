@@ -92,19 +92,53 @@
 #
 #   --spe_eos: Adds </s> as End-of-Sentence special token.
 #
+#   --corpus_lower_case: Lowercase the transcripts while extracting them from the manifests into document.txt.
+#
+#   --corpus_charset: Drop the characters outside of this set while extracting the transcripts. Either a string
+#       of allowed characters or `bambara` for the Bambara alphabet, digits and basic punctuation.
+#
+#   --num_workers: Number of manifests extracted in parallel when several are given, and number of
+#       tokenizers trained in parallel in sweep mode.
+#
+#   --sweep_vocab_sizes: Comma separated vocabulary sizes. When given, one tokenizer is trained per combination
+#       of vocabulary size and SentencePiece type (see --sweep_spe_types) in a process pool, and each one is
+#       evaluated on the manifests: tokens per second of audio, tokens per utterance and CTC feasibility
+#       margin, i.e. the number of encoder frames left once the target tokens are placed. The report is
+#       written to <data_root>/tokenizer_sweep.json.
+#
+#   --sweep_spe_types: Comma separated SentencePiece types swept with --sweep_vocab_sizes, defaults to --spe_type.
+#
+#   --sweep_manifests: Comma separated manifests the sweep tokenizers are evaluated on, defaults to --manifest.
+#
+#   --subsampling_factor / --window_stride / --sample_rate: Encoder time reduction, preprocessor hop and sample
+#       rate used to compute the encoder output lengths in sweep mode (8 / 0.01 / 16000 for FastConformer).
+#
 #   --log: Whether the script should display log messages
 
 
 import argparse
+import hashlib
 import json
 import logging
 import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional
 
+import numpy as np
+import sentencepiece as spm
 import tokenizers
 
 from nemo.collections.common.tokenizers.sentencepiece_tokenizer import create_spt_model
 from nemo.utils.data_utils import DataStoreObject
+from omegaconf import OmegaConf
+
+try:
+    from .helpers import encoder_output_lengths
+except ImportError:
+    # Run as a script: python utils/process_asr_text_tokenizer.py
+    from helpers import encoder_output_lengths
 
 parser = argparse.ArgumentParser(description='Create tokenizer')
 group = parser.add_mutually_exclusive_group(required=True)
@@ -170,14 +204,87 @@ parser.add_argument(
     help="If <unk>, fallback to a byte sequence of the characters.",
 )
 parser.add_argument('--no_lower_case', dest='lower_case', action='store_false')
+parser.add_argument('--corpus_lower_case', action='store_true', help='Lowercase transcripts when building the corpus.')
+parser.add_argument(
+    '--corpus_charset',
+    default=None,
+    type=str,
+    help="Characters kept when building the corpus from manifests, or `bambara` for the Bambara alphabet.",
+)
+parser.add_argument(
+    '--num_workers', default=None, type=int, help='Number of manifests extracted or tokenizers trained in parallel.'
+)
+parser.add_argument('--sweep_vocab_sizes', default=None, type=str, help='Comma separated vocabulary sizes to sweep.')
+parser.add_argument('--sweep_spe_types', default=None, type=str, help='Comma separated SentencePiece types to sweep.')
+parser.add_argument('--sweep_manifests', default=None, type=str, help='Manifests the swept tokenizers are evaluated on.')
+parser.add_argument('--subsampling_factor', default=8, type=int, help='Encoder time reduction (sweep mode).')
+parser.add_argument('--window_stride', default=0.01, type=float, help='Preprocessor hop in seconds (sweep mode).')
+parser.add_argument('--sample_rate', default=16000, type=int, help='Audio sample rate (sweep mode).')
 parser.add_argument("--log", action='store_true')
 parser.set_defaults(log=False, lower_case=True, spe_train_extremely_large_corpus=False)
 args = parser.parse_args()
 
 
+# Bambara alphabet (the character vocabulary of the QuartzNet models), digits and basic punctuation
+BAMBARA_CHARSET = "0123456789abcdefghijklmnopqrstuvwxyzŋɔɛɲɓɾ '-"
+
+# Size of the write buffer of the corpus, lines are written in bulk instead of being flushed one by one
+_WRITE_BUFFER = 1 << 20
+
+
+def _corpus_charset(charset: Optional[str]) -> Optional[frozenset]:
+    if charset is None:
+        return None
+    if charset == 'bambara':
+        charset = BAMBARA_CHARSET + BAMBARA_CHARSET.upper()
+    return frozenset(charset)
+
+
+def _normalize_text(text: str, lower_case: bool, charset: Optional[frozenset]) -> str:
+    if lower_case:
+        text = text.lower()
+    if charset is not None:
+        text = re.sub(r'\s+', ' ', ''.join(c for c in text if c in charset)).strip()
+    return text
+
+
+def _extract_manifest(job):
+    """Worker: write the (normalized) transcripts of one manifest to `part_path`, return the number of lines."""
+    manifest, part_path, lower_case, charset = job
+    charset = _corpus_charset(charset)
+    num_lines = 0
+    with open(DataStoreObject(manifest).get(), 'r', encoding='utf-8') as in_reader, open(
+        part_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER
+    ) as out_writer:
+        for line in in_reader:
+            if not line.strip():
+                continue
+            text = _normalize_text(json.loads(line)['text'], lower_case, charset)
+            out_writer.write(text + '\n')
+            num_lines += 1
+    logging.info(f"Finished extracting manifest : {manifest}")
+    return num_lines
+
+
+def _manifests_fingerprint(manifests: List[str], lower_case: bool, charset: Optional[str]) -> str:
+    """Fingerprint of the manifests (path, size and mtime of local files) and of the normalization options."""
+    parts = [json.dumps({'lower_case': lower_case, 'charset': charset})]
+    for manifest in manifests:
+        if os.path.exists(manifest):
+            st = os.stat(manifest)
+            parts.append(f'{os.path.abspath(manifest)}:{st.st_size}:{st.st_mtime_ns}')
+        else:
+            # Remote manifests can't be checked cheaply, their path is all we have
+            parts.append(manifest)
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
 def __build_document_from_manifests(
     data_root: str,
     manifests: str,
+    lower_case: bool = False,
+    charset: Optional[str] = None,
+    num_workers: Optional[int] = None,
 ):
     if ',' in manifests:
         manifests = manifests.split(',')
@@ -189,27 +296,38 @@ def __build_document_from_manifests(
         os.makedirs(document_dir)
 
     document_path = os.path.join(document_dir, 'document.txt')
-
+    fingerprint_path = document_path + '.fingerprint'
+    fingerprint = _manifests_fingerprint(manifests, lower_case, charset)
+
+    if os.path.exists(document_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, 'r') as f:
+            if f.read().strip() == fingerprint:
+                logging.info('Corpus already exists at path : %s', document_path)
+                return document_path
     if os.path.exists(document_path):
-        logging.info('Corpus already exists at path : %s', document_path)
-        return document_path
-
-    num_lines = 0
-    with open(document_path, 'w') as out_writer:
-        for manifest in manifests:
-            with open(DataStoreObject(manifest).get(), 'r') as in_reader:
-                for line in in_reader:
-                    item = json.loads(line)
-                    text = item['text']
-
-                    out_writer.write(text + '\n')
-                    out_writer.flush()
-
-                    num_lines += 1
-
-            logging.info(f"Finished extracting manifest : {manifest}")
-
-        logging.info("Finished extracting all manifests ! Number of sentences : {}".format(num_lines))
+        logging.info('Manifests changed since %s was built, rebuilding it', document_path)
+
+    jobs = [
+        (manifest, f'{document_path}.part{i}', lower_case, charset) for i, manifest in enumerate(manifests)
+    ]
+    if len(jobs) > 1 and num_workers != 1:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), num_workers or os.cpu_count() or 1)) as executor:
+            line_counts = list(executor.map(_extract_manifest, jobs))
+    else:
+        line_counts = [_extract_manifest(job) for job in jobs]
+
+    # Concatenate the parts in manifest order, then swap the corpus in atomically
+    tmp_path = document_path + '.tmp'
+    with open(tmp_path, 'wb') as out_writer:
+        for _, part_path, _, _ in jobs:
+            with open(part_path, 'rb') as in_reader:
+                shutil.copyfileobj(in_reader, out_writer, _WRITE_BUFFER)
+            os.remove(part_path)
+    os.replace(tmp_path, document_path)
+    with open(fingerprint_path, 'w') as f:
+        f.write(fingerprint)
+
+    logging.info("Finished extracting all manifests ! Number of sentences : {}".format(sum(line_counts)))
     return document_path
 
 
@@ -326,6 +444,100 @@ def __process_data(
     return tokenizer_dir
 
 
+def _train_tokenizer(kwargs):
+    """Worker: train one tokenizer of the sweep."""
+    return __process_data(**kwargs)
+
+
+def _load_encoder(tokenizer_dir: str, tokenizer_type: str, lower_case: bool):
+    """Batch encoding function of a trained tokenizer, without special tokens."""
+    if tokenizer_type == 'spe':
+        processor = spm.SentencePieceProcessor(model_file=os.path.join(tokenizer_dir, 'tokenizer.model'))
+        return lambda texts: processor.encode([t.lower() if lower_case else t for t in texts])
+    wordpiece = tokenizers.BertWordPieceTokenizer(os.path.join(tokenizer_dir, 'vocab.txt'), lowercase=lower_case)
+    return lambda texts: [e.ids for e in wordpiece.encode_batch(texts, add_special_tokens=False)]
+
+
+def _evaluate_tokenizer(job):
+    """
+    Worker: token statistics of a tokenizer over the manifest transcripts, the encoder output lengths being
+    computed by `utils.helpers.encoder_output_lengths`.
+    """
+    tokenizer_dir, tokenizer_type, lower_case, texts, durations, sample_rate, window_stride, subsampling_factor = job
+    encode = _load_encoder(tokenizer_dir, tokenizer_type, lower_case)
+    target_lengths = np.asarray([len(ids) for ids in encode(texts)], dtype=np.int64)
+    am_lengths = encoder_output_lengths(
+        durations,
+        OmegaConf.create({'sample_rate': sample_rate, 'window_stride': window_stride}),
+        OmegaConf.create({'subsampling_factor': subsampling_factor}),
+    )
+    margins = am_lengths - target_lengths
+    return {
+        'tokenizer_dir': tokenizer_dir,
+        'tokens_per_second': float(target_lengths.sum() / durations.sum()),
+        'mean_tokens_per_utterance': float(target_lengths.mean()),
+        'max_tokens_per_utterance': int(target_lengths.max()),
+        'ctc_failures': int((margins <= 0).sum()),
+        'ctc_failure_rate': float((margins <= 0).mean()),
+        'min_ctc_margin': int(margins.min()),
+        'ctc_margin_p1': float(np.percentile(margins, 1)),
+        'ctc_margin_p50': float(np.percentile(margins, 50)),
+    }
+
+
+def _sweep(text_corpus_path: str, data_root: str, tokenizer_kwargs: dict) -> str:
+    """Train the tokenizers of the sweep in parallel, evaluate them on the manifests and write the report."""
+    vocab_sizes = [int(v) for v in args.sweep_vocab_sizes.split(',')]
+    spe_types = args.sweep_spe_types.split(',') if args.sweep_spe_types else [args.spe_type]
+    if args.tokenizer != 'spe':
+        # WordPiece tokenizers only have a vocabulary size
+        spe_types = [args.spe_type]
+    jobs = [
+        {**tokenizer_kwargs, 'vocab_size': vocab_size, 'spe_type': spe_type}
+        for spe_type in spe_types
+        for vocab_size in vocab_sizes
+    ]
+    with ProcessPoolExecutor(max_workers=min(len(jobs), args.num_workers or os.cpu_count() or 1)) as executor:
+        tokenizer_dirs = list(executor.map(_train_tokenizer, jobs))
+
+    manifests = args.sweep_manifests or args.manifest
+    if not manifests:
+        raise ValueError('--sweep_manifests is required to evaluate tokenizers trained from --data_file')
+    texts, durations = [], []
+    for manifest in manifests.split(','):
+        with open(DataStoreObject(manifest).get(), 'r', encoding='utf-8') as in_reader:
+            for line in in_reader:
+                if line.strip():
+                    item = json.loads(line)
+                    texts.append(item['text'])
+                    durations.append(item['duration'])
+    durations = np.asarray(durations, dtype=np.float64)
+
+    eval_jobs = [
+        (
+            tokenizer_dir, args.tokenizer, args.lower_case, texts, durations,
+            args.sample_rate, args.window_stride, args.subsampling_factor,
+        )
+        for tokenizer_dir in tokenizer_dirs
+    ]
+    with ProcessPoolExecutor(max_workers=min(len(eval_jobs), args.num_workers or os.cpu_count() or 1)) as executor:
+        results = list(executor.map(_evaluate_tokenizer, eval_jobs))
+    for job, result in zip(jobs, results):
+        result.update(vocab_size=job['vocab_size'], spe_type=job['spe_type'] if args.tokenizer == 'spe' else None)
+
+    report_path = os.path.join(data_root, 'tokenizer_sweep.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'manifests': manifests, 'num_utterances': len(texts), 'tokenizers': results}, f, indent=2)
+
+    print(f"{'tokenizer':<40} {'tok/s':>7} {'tok/utt':>8} {'ctc fail':>9} {'min margin':>11}")
+    for result in results:
+        print(
+            f"{os.path.basename(result['tokenizer_dir']):<40} {result['tokens_per_second']:>7.2f} "
+            f"{result['mean_tokens_per_utterance']:>8.1f} {result['ctc_failures']:>9d} {result['min_ctc_margin']:>11d}"
+        )
+    return report_path
+
+
 def main():
     data_root = args.data_root
     manifests = args.manifest
@@ -353,15 +565,21 @@ def main():
         logging.basicConfig(level=logging.INFO)
 
     if manifests:
-        text_corpus_path = __build_document_from_manifests(data_root, manifests)
+        text_corpus_path = __build_document_from_manifests(
+            data_root,
+            manifests,
+            lower_case=args.corpus_lower_case,
+            charset=args.corpus_charset,
+            num_workers=args.num_workers,
+        )
     else:
         text_corpus_path = data_file
-    tokenizer_path = __process_data(
-        text_corpus_path,
-        data_root,
-        vocab_size,
-        tokenizer,
-        spe_type,
+    tokenizer_kwargs = dict(
+        text_path=text_corpus_path,
+        dst_folder=data_root,
+        vocab_size=vocab_size,
+        tokenizer_type=tokenizer,
+        spe_type=spe_type,
         lower_case=lower_case,
         spe_character_coverage=spe_character_coverage,
         spe_sample_size=spe_sample_size,
@@ -378,6 +596,14 @@ def main():
         spe_remove_extra_whitespaces=spe_remove_extra_whitespaces,
     )
 
+    if args.sweep_vocab_sizes:
+        report_path = _sweep(text_corpus_path, data_root, tokenizer_kwargs)
+        print("Tokenizer sweep report :", report_path)
+        logging.info('Done!')
+        return
+
+    tokenizer_path = __process_data(**tokenizer_kwargs)
+
     print("Serialized tokenizer at location :", tokenizer_path)
     logging.info('Done!')
 
@@ -0,0 +1,223 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.safetensors_checkpoint --nemo=models/soloba-1.1B-tdt-v2.nemo \
+#         --output_dir=models/soloba-1.1B-tdt-v2 --shard_size_mb=2048
+#
+# Exports a .nemo checkpoint to a directory of sharded safetensors files, with the model config as a YAML
+# sidecar and the model's artifacts (tokenizer files) next to it. `load_model` rebuilds the model from the
+# sidecar directly on the target device and streams the weights from the memory-mapped shards one tensor
+# at a time, instead of unpacking the tarball and loading the whole state dict in host memory. Point
+# `model.name` of a training config, or `--model` of the inference scripts, to the export directory.
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import torch
+from omegaconf import DictConfig, OmegaConf, open_dict
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+INDEX_FILE = "model.safetensors.index.json"
+CONFIG_FILE = "model_config.yaml"
+ARTIFACTS_DIR = "artifacts"
+# Prefix of the paths of artifacts packaged in a .nemo file
+NEMO_PREFIX = "nemo:"
+
+def is_safetensors_checkpoint(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+def _member(archive: tarfile.TarFile, name: str) -> tarfile.TarInfo:
+    """Member of a .nemo archive, whose names may or may not start with `./`."""
+    for member in archive.getmembers():
+        if os.path.normpath(member.name) == name:
+            return member
+    raise KeyError(f"{name} not found in {archive.name}")
+
+def _artifact_keys(container: Any, prefix: str = "") -> Dict[str, str]:
+    """Config keys whose value points to a file packaged in the .nemo archive, with the file name."""
+    keys = {}
+    if isinstance(container, dict):
+        items = container.items()
+    elif isinstance(container, list):
+        items = enumerate(container)
+    else:
+        return keys
+    for key, value in items:
+        path = f"{prefix}{key}"
+        if isinstance(value, str) and value.startswith(NEMO_PREFIX):
+            keys[path] = value[len(NEMO_PREFIX):]
+        else:
+            keys.update(_artifact_keys(value, f"{path}."))
+    return keys
+
+def _shards(state_dict: Dict[str, torch.Tensor], shard_size: int) -> List[Dict[str, torch.Tensor]]:
+    """Split a state dict in order into shards of at most `shard_size` bytes (or one tensor, if larger)."""
+    shards, current, current_size = [], {}, 0
+    storages = set()
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().contiguous()
+        storage = tensor.untyped_storage()
+        # safetensors rejects tensors sharing memory (tied weights, views)
+        if storage.data_ptr() in storages or storage.nbytes() != tensor.numel() * tensor.element_size():
+            tensor = tensor.clone()
+        storages.add(tensor.untyped_storage().data_ptr())
+        size = tensor.numel() * tensor.element_size()
+        if current and current_size + size > shard_size:
+            shards.append(current)
+            current, current_size = {}, 0
+        current[name] = tensor
+        current_size += size
+    if current:
+        shards.append(current)
+    return shards
+
+def export_nemo(nemo_path: str, output_dir: str, shard_size_mb: int = 2048) -> Dict[str, Any]:
+    """
+    Export a .nemo checkpoint to sharded safetensors.
+
+    Args:
+        nemo_path (str): Path to the .nemo file, e.g. the `save_model_path` of a training config.
+        output_dir (str): Directory receiving the shards, the index, the config sidecar and the artifacts.
+        shard_size_mb (int): Maximum size of a shard.
+
+    Returns:
+        dict: The index written to `<output_dir>/model.safetensors.index.json`.
+    """
+    os.makedirs(os.path.join(output_dir, ARTIFACTS_DIR), exist_ok=True)
+    with tarfile.open(nemo_path, "r:*") as archive, tempfile.TemporaryDirectory() as tmp_dir:
+        config = OmegaConf.to_container(
+            OmegaConf.create(archive.extractfile(_member(archive, "model_config.yaml")).read().decode("utf-8"))
+        )
+        artifacts = {}
+        for key, name in _artifact_keys(config).items():
+            with archive.extractfile(_member(archive, name)) as src, \
+                    open(os.path.join(output_dir, ARTIFACTS_DIR, name), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            artifacts[key] = os.path.join(ARTIFACTS_DIR, name)
+        archive.extract(_member(archive, "model_weights.ckpt"), tmp_dir)
+        weights_path = next(
+            os.path.join(root, name) for root, _, names in os.walk(tmp_dir) for name in names if name == "model_weights.ckpt"
+        )
+        state_dict = torch.load(weights_path, map_location="cpu")
+
+    # Rewritten to the exported files by `load_config`, the sidecar keeps the original values otherwise
+    OmegaConf.save(OmegaConf.create(config), os.path.join(output_dir, CONFIG_FILE))
+    shards = _shards(state_dict, shard_size_mb * 1024 * 1024)
+    weight_map = {}
+    for i, shard in enumerate(shards):
+        shard_name = f"model-{i + 1:05d}-of-{len(shards):05d}.safetensors"
+        save_file(shard, os.path.join(output_dir, shard_name), metadata={"format": "pt"})
+        weight_map.update({name: shard_name for name in shard})
+
+    index = {
+        "metadata": {
+            "source": os.path.abspath(nemo_path),
+            "target": config.get("target", None),
+            "total_size": sum(t.numel() * t.element_size() for shard in shards for t in shard.values()),
+            "artifacts": artifacts,
+        },
+        "weight_map": weight_map,
+    }
+    # Written last, an interrupted export is not mistaken for a complete one
+    with open(os.path.join(output_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    print(f"Exported {len(weight_map)} tensors of {nemo_path} to {len(shards)} shards in {output_dir}")
+    return index
+
+def _read_index(checkpoint_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(checkpoint_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_config(checkpoint_dir: str) -> DictConfig:
+    """
+    The model config of an export, with its artifacts pointing at the exported files and the data loaders'
+    setup deferred (their manifests are those of the original training run).
+    """
+    index = _read_index(checkpoint_dir)
+    config = OmegaConf.load(os.path.join(checkpoint_dir, CONFIG_FILE))
+    with open_dict(config):
+        for key, path in index["metadata"]["artifacts"].items():
+            OmegaConf.update(config, key, os.path.abspath(os.path.join(checkpoint_dir, path)))
+        if index["metadata"]["artifacts"] and config.get("tokenizer", None) is not None:
+            config.tokenizer.dir = os.path.abspath(os.path.join(checkpoint_dir, ARTIFACTS_DIR))
+        for split in ("train_ds", "validation_ds", "test_ds"):
+            if config.get(split, None) is not None:
+                config[split].defer_setup = True
+    return config
+
+@torch.no_grad()
+def load_weights(model: torch.nn.Module, checkpoint_dir: str) -> None:
+    """
+    Copy the weights of an export into `model`, one tensor at a time from the memory-mapped shards to the
+    device of the matching parameter, so host memory never holds more than one tensor.
+    """
+    index = _read_index(checkpoint_dir)
+    targets = model.state_dict()
+    missing = set(targets) - set(index["weight_map"])
+    unexpected = set(index["weight_map"]) - set(targets)
+    if missing or unexpected:
+        raise RuntimeError(
+            f"{checkpoint_dir} doesn't match the model: missing {sorted(missing)[:10]}, unexpected {sorted(unexpected)[:10]}"
+        )
+    for shard_name in sorted(set(index["weight_map"].values())):
+        shard_path = os.path.join(checkpoint_dir, shard_name)
+        with safe_open(shard_path, framework="pt", device="cpu") as f:
+            for name in f.keys():
+                target = targets[name]
+                tensor = f.get_tensor(name)
+                if tensor.shape != target.shape:
+                    raise RuntimeError(f"{name}: shape {tuple(tensor.shape)} in {shard_name}, {tuple(target.shape)} in the model")
+                target.copy_(tensor, non_blocking=target.is_cuda)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+def load_model(checkpoint_dir: str, device: Optional[torch.device] = None, model_class: Optional[type] = None):
+    """
+    Rebuild a model from a safetensors export directly on `device` (defaults to the CPU) and load its weights.
+
+    Args:
+        checkpoint_dir (str): Directory written by `export_nemo`.
+        device (torch.device, optional): Device the model is created and loaded on.
+        model_class (type, optional): Class of the model, defaults to the `target` of its config.
+    """
+    from nemo.utils.model_utils import import_class_by_path
+
+    start = time.perf_counter()
+    config = load_config(checkpoint_dir)
+    model_class = model_class or import_class_by_path(config.target)
+    device = torch.device(device or "cpu")
+    # Parameters are allocated on the device, they are only initialized before the weights are copied in
+    with device:
+        model = model_class(cfg=config)
+    model.to(device)
+    load_weights(model, checkpoint_dir)
+    print(f"Loaded {checkpoint_dir} on {device} in {time.perf_counter() - start:.2f}s")
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a .nemo checkpoint to sharded safetensors")
+    parser.add_argument("--nemo", required=True, type=str, help="Path to the .nemo checkpoint")
+    parser.add_argument("--output_dir", required=True, type=str, help="Export directory")
+    parser.add_argument("--shard_size_mb", default=2048, type=int, help="Maximum size of a shard")
+    args = parser.parse_args()
+
+    export_nemo(args.nemo, args.output_dir, shard_size_mb=args.shard_size_mb)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Callable, Iterator, List, Optional, Tuple
+import copy
+import math
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+import torch
+from omegaconf import open_dict
+from .helpers import encoder_subsampling_factor
+from .inference import autocast, ctc_log_probs, encode, is_hybrid
+
+def audio_windows(
+    audio_path: str, sample_rate: int, chunk_len: float, left_context: float, right_context: float
+) -> Iterator[Tuple[np.ndarray, int, int]]:
+    """
+    Read an audio file window by window, each window holding a chunk with its left and right context.
+
+    Only one window is in memory at a time. Yields `(window, left, chunk)` where `window` is mono float32
+    at `sample_rate`, and `left`/`chunk` are the number of its samples before and inside the chunk.
+    """
+    with sf.SoundFile(audio_path) as f:
+        sr = f.samplerate
+        chunk, left, right = (int(round(x * sr)) for x in (chunk_len, left_context, right_context))
+        for start in range(0, f.frames, chunk):
+            window_start = max(0, start - left)
+            f.seek(window_start)
+            window = f.read(min(f.frames, start + chunk + right) - window_start, dtype="float32", always_2d=True)
+            window = window.mean(axis=1)
+            window_left, window_chunk = start - window_start, min(chunk, f.frames - start)
+            if sr != sample_rate:
+                window = librosa.resample(window, orig_sr=sr, target_sr=sample_rate)
+                window_left = int(round(window_left * sample_rate / sr))
+                window_chunk = int(round(window_chunk * sample_rate / sr))
+            yield window, window_left, window_chunk
+
+class ChunkedTranscriber:
+    """
+    Transcribe arbitrarily long audio with a bounded amount of memory.
+
+    The audio is processed in `chunk_len` second chunks, each encoded with `left_context` and `right_context`
+    seconds of surrounding audio so that frames near the chunk edges see the same context as in training.
+    Only the encoder frames of the chunk itself are decoded:
+
+    - with the CTC head (QuartzNet, or the auxiliary head of hybrid models), frame-level greedy labels are
+      concatenated across chunks and collapsed once, so a token spanning a boundary is emitted once;
+    - with the TDT/RNNT head, greedy decoding continues from the previous chunk's hypothesis, carrying the
+      prediction network state across boundaries.
+    """
+    def __init__(
+        self, model, decoder: str = "default", chunk_len: float = 20.0, left_context: float = 5.0,
+        right_context: float = 5.0, amp: Optional[str] = None,
+    ):
+        self.model = model
+        self.device = next(model.parameters()).device
+        self.amp = amp
+        self.chunk_len = chunk_len
+        self.left_context = left_context
+        self.right_context = right_context
+        self.sample_rate = model.cfg.preprocessor.sample_rate
+        # Number of audio samples per encoder output frame
+        hop_length = int(self.sample_rate * model.cfg.preprocessor.window_stride)
+        self.samples_per_frame = hop_length * encoder_subsampling_factor(model.cfg.encoder)
+
+        transducer = hasattr(model, "joint")
+        self.use_ctc = decoder == "ctc" or not transducer
+        if decoder == "ctc" and transducer and not is_hybrid(model):
+            raise ValueError("This model has no CTC decoder")
+        if decoder == "tdt" and not transducer:
+            raise ValueError("This model has no TDT/RNNT decoder")
+        if not self.use_ctc:
+            # Continuing a hypothesis across chunks needs the frame-by-frame greedy decoder
+            decoding_cfg = copy.deepcopy(model.cfg.decoding)
+            with open_dict(decoding_cfg):
+                decoding_cfg.strategy = "greedy"
+            if is_hybrid(model):
+                model.change_decoding_strategy(decoding_cfg=decoding_cfg, decoder_type="rnnt", verbose=False)
+            else:
+                model.change_decoding_strategy(decoding_cfg=decoding_cfg, verbose=False)
+
+    def _ids_to_text(self, ids: List[int]) -> str:
+        if getattr(self.model, "tokenizer", None) is not None:
+            return self.model.tokenizer.ids_to_text(ids)
+        vocabulary = self.model.decoder.vocabulary
+        return "".join(vocabulary[i] for i in ids)
+
+    def _chunk_frames(self, left: int, chunk: int, num_frames: int) -> slice:
+        """Encoder frames belonging to the chunk, the context frames on both sides are dropped."""
+        first = int(round(left / self.samples_per_frame))
+        last = min(num_frames, first + math.ceil(chunk / self.samples_per_frame))
+        return slice(first, last)
+
+    def stream_ids(self, audio_path: str) -> Iterator[Tuple[List[int], float]]:
+        """
+        Yield `(ids, latency)` for every chunk of the file as soon as it is decoded, `ids` being the tokens
+        emitted for that chunk and `latency` the time spent on it in seconds.
+        """
+        previous_label = None
+        hypotheses = None
+        emitted = 0
+        for window, left, chunk in audio_windows(
+            audio_path, self.sample_rate, self.chunk_len, self.left_context, self.right_context
+        ):
+            start = time.perf_counter()
+            signal = torch.from_numpy(window).unsqueeze(0).to(self.device)
+            length = torch.tensor([len(window)], device=self.device)
+            with torch.inference_mode(), autocast(self.device, self.amp):
+                encoded, encoded_len = encode(self.model, signal, length)
+                frames = self._chunk_frames(left, chunk, int(encoded_len[0]))
+                encoded = encoded[:, :, frames].float()
+
+                if self.use_ctc:
+                    labels = ctc_log_probs(self.model, encoded).argmax(dim=-1)[0].tolist()
+                    blank = self._blank_id
+                    ids = []
+                    for label in labels:
+                        # Collapse repeats across the chunk boundary too
+                        if label != previous_label and label != blank:
+                            ids.append(label)
+                        previous_label = label
+                else:
+                    hypotheses = self.model.decoding.rnnt_decoder_predictions_tensor(
+                        encoder_output=encoded,
+                        encoded_lengths=torch.tensor([encoded.shape[-1]], device=self.device),
+                        return_hypotheses=True,
+                        partial_hypotheses=hypotheses,
+                    )
+                    if isinstance(hypotheses, tuple):
+                        hypotheses = hypotheses[0]
+                    y_sequence = hypotheses[0].y_sequence
+                    y_sequence = y_sequence.tolist() if torch.is_tensor(y_sequence) else list(y_sequence)
+                    ids = y_sequence[emitted:]
+                    emitted = len(y_sequence)
+            yield ids, time.perf_counter() - start
+
+    def stream(self, audio_path: str) -> Iterator[Tuple[str, float]]:
+        """Like `stream_ids`, with the tokens of each chunk converted to text."""
+        for ids, latency in self.stream_ids(audio_path):
+            yield self._ids_to_text(ids), latency
+
+    @property
+    def _blank_id(self) -> int:
+        """CTC heads put the blank label after the vocabulary."""
+        decoder = self.model.ctc_decoder if is_hybrid(self.model) else self.model.decoder
+        return decoder.num_classes_with_blank - 1
+
+    def transcribe(self, audio_path: str, on_chunk: Optional[Callable[[str, float], None]] = None) -> Tuple[str, dict]:
+        """
+        Transcribe a whole file, returning its text and per-chunk latency statistics.
+        `on_chunk(text, latency)` is called after each chunk if given.
+        """
+        ids, latencies = [], []
+        for chunk_ids, latency in self.stream_ids(audio_path):
+            ids.extend(chunk_ids)
+            latencies.append(latency)
+            if on_chunk is not None:
+                on_chunk(self._ids_to_text(chunk_ids), latency)
+        stats = {
+            "num_chunks": len(latencies),
+            "max_chunk_latency": max(latencies, default=0.0),
+            "mean_chunk_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "processing_time": sum(latencies),
+        }
+        # Decoded once so sub-word tokens split by a chunk boundary are joined correctly
+        return self._ids_to_text(ids), stats
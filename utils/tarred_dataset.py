@@ -0,0 +1,251 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.tarred_dataset --manifest=<path to manifest> \
+#         --output_dir="<output directory>" \
+#         --shard_size_mb=<target size of each tar shard> \
+#         --num_buckets=<number of duration buckets> \
+#         --shard_multiple=<number of GPUs the shards are read from>
+#
+# Packs the audio files of a NeMo manifest into size-balanced tar shards, optionally split into
+# duration buckets, and writes one tarred manifest per bucket plus a `shards.json` description of
+# the output. Point a data loader at it by adding `tarred_dir: <output directory>` to its section in
+# the YAML config (see `apply_tarred_config`).
+from typing import Any, Dict, List
+import argparse
+import heapq
+import json
+import math
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from omegaconf import DictConfig, open_dict
+from .preprocessing import check_and_convert_audio_channels
+
+SHARDS_METADATA = "shards.json"
+
+def _split_buckets(entries: List[dict], num_buckets: int) -> List[List[dict]]:
+    """Sort entries by duration and split them into buckets holding the same total duration."""
+    entries = sorted(entries, key=lambda e: e["duration"])
+    target = sum(e["duration"] for e in entries) / num_buckets
+    buckets, current, current_duration = [], [], 0.0
+    for entry in entries:
+        current.append(entry)
+        current_duration += entry["duration"]
+        if current_duration >= target and len(buckets) < num_buckets - 1:
+            buckets.append(current)
+            current, current_duration = [], 0.0
+    if current:
+        buckets.append(current)
+    return buckets
+
+def _assign_shards(entries: List[dict], num_shards: int) -> List[List[dict]]:
+    """Greedy largest-first assignment of files to the currently smallest shard, balancing bytes per shard."""
+    heap = [(0, shard_id) for shard_id in range(num_shards)]
+    shards = [[] for _ in range(num_shards)]
+    for entry in sorted(entries, key=lambda e: e["size"], reverse=True):
+        size, shard_id = heapq.heappop(heap)
+        shards[shard_id].append(entry)
+        heapq.heappush(heap, (size + entry["size"], shard_id))
+    return shards
+
+def _write_shard(args) -> List[dict]:
+    """Worker: write one tar shard and return its manifest entries."""
+    tar_path, shard_id, entries = args
+    manifest_entries = []
+    with tarfile.open(tar_path, mode="w") as tar:
+        for entry in entries:
+            tar.add(entry["audio_filepath"], arcname=entry["member_name"])
+            manifest_entry = {k: v for k, v in entry.items() if k not in ("member_name", "size")}
+            # The tarred datasets match manifest entries to tar members by file name
+            manifest_entry["audio_filepath"] = entry["member_name"]
+            manifest_entry["shard_id"] = shard_id
+            manifest_entries.append(manifest_entry)
+    return manifest_entries
+
+def create_tarred_dataset(
+    manifest_path: str,
+    output_dir: str,
+    shard_size_mb: float = 512,
+    num_buckets: int = 1,
+    shard_multiple: int = 1,
+    min_duration: float = 0.0,
+    max_duration: float = float("inf"),
+    num_workers: int = None,
+) -> Dict[str, Any]:
+    """
+    Pack the audio files of a manifest into size-balanced, duration-bucketed tar shards.
+
+    Args:
+        manifest_path (str): Path to a NeMo JSON-lines manifest with `audio_filepath` and `duration` fields.
+        output_dir (str): Directory receiving the shards, the tarred manifests and `shards.json`.
+        shard_size_mb (float): Target size of each shard, the number of shards of a bucket is derived from it.
+        num_buckets (int): Number of duration buckets, each holding roughly the same amount of audio. Fewer
+            buckets are written when a few long files fill more than one bucket's share of the audio.
+        shard_multiple (int): The number of shards of each bucket is rounded up to a multiple of this value,
+            set it to the number of devices so every rank reads the same number of shards. It is capped by the
+            number of files of the bucket, a bucket with fewer files than `shard_multiple` raises a ValueError.
+        min_duration (float): Entries shorter than this are left out.
+        max_duration (float): Entries longer than this are left out.
+        num_workers (int, optional): Number of shards written in parallel, defaults to the number of CPUs.
+
+    Returns:
+        dict: The content written to `shards.json`.
+    """
+    entries = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if not min_duration <= entry["duration"] <= max_duration:
+                continue
+            entry["size"] = os.path.getsize(entry["audio_filepath"])
+            # Prefix with the manifest line so identical file names from different folders don't collide
+            entry["member_name"] = f"{index:09d}_{os.path.basename(entry['audio_filepath'])}"
+            entries.append(entry)
+
+    buckets = _split_buckets(entries, num_buckets)
+    # Every shard must hold at least one file, empty shards leave ranks without samples
+    too_small = [(bucket_id + 1, len(bucket)) for bucket_id, bucket in enumerate(buckets) if len(bucket) < shard_multiple]
+    if too_small:
+        raise ValueError(
+            f"Buckets {', '.join(f'{bucket_id} ({num_files} files)' for bucket_id, num_files in too_small)} hold fewer "
+            f"files than shard_multiple={shard_multiple}, lower --num_buckets or --shard_multiple"
+        )
+    if len(buckets) < num_buckets:
+        print(f"Only {len(buckets)} of the {num_buckets} requested duration buckets could be filled")
+
+    os.makedirs(output_dir, exist_ok=True)
+    metadata = {
+        "source_manifest": os.path.abspath(manifest_path),
+        "num_buckets_requested": num_buckets,
+        "num_buckets": len(buckets),
+        "buckets": [],
+    }
+    jobs, bucket_dirs = [], []
+    for bucket_id, bucket in enumerate(buckets):
+        bucket_dir = output_dir if num_buckets == 1 else os.path.join(output_dir, f"bucket{bucket_id + 1}")
+        os.makedirs(bucket_dir, exist_ok=True)
+        bucket_bytes = sum(e["size"] for e in bucket)
+        num_shards = max(1, math.ceil(bucket_bytes / (shard_size_mb * 1024 * 1024)))
+        # Round up to the multiple, but never past the number of files (rounded down to the multiple)
+        num_shards = min(
+            math.ceil(num_shards / shard_multiple) * shard_multiple,
+            len(bucket) // shard_multiple * shard_multiple,
+        )
+        shards = _assign_shards(bucket, num_shards)
+        jobs.extend(
+            (os.path.join(bucket_dir, f"audio_{shard_id}.tar"), shard_id, shard)
+            for shard_id, shard in enumerate(shards)
+        )
+        bucket_dirs.append((bucket_dir, num_shards))
+        metadata["buckets"].append({
+            "manifest_filepath": os.path.abspath(os.path.join(bucket_dir, "tarred_audio_manifest.json")),
+            "tarred_audio_filepaths": os.path.abspath(
+                os.path.join(bucket_dir, f"audio__OP_0..{num_shards - 1}_CL_.tar")
+            ),
+            "num_shards": num_shards,
+            "num_files": len(bucket),
+            "min_duration": bucket[0]["duration"],
+            "max_duration": bucket[-1]["duration"],
+            "total_duration": sum(e["duration"] for e in bucket),
+        })
+
+    with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+        results = list(executor.map(_write_shard, jobs))
+
+    # Shards were submitted bucket by bucket, write each bucket's manifest in shard order
+    offset = 0
+    for bucket_meta, (bucket_dir, num_shards) in zip(metadata["buckets"], bucket_dirs):
+        with open(bucket_meta["manifest_filepath"], "w", encoding="utf-8") as fout:
+            for shard_entries in results[offset:offset + num_shards]:
+                for entry in shard_entries:
+                    fout.write(json.dumps(entry) + "\n")
+        offset += num_shards
+
+    with open(os.path.join(output_dir, SHARDS_METADATA), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+def apply_tarred_config(loader_config: DictConfig) -> DictConfig:
+    """
+    Switch a data loader section of the YAML config to the shards written by `create_tarred_dataset`.
+
+    Does nothing unless the section sets `tarred_dir`. Otherwise `manifest_filepath` and
+    `tarred_audio_filepaths` are replaced by the ones listed in `<tarred_dir>/shards.json`, `is_tarred` is
+    set, and multi-bucket outputs are read with NeMo's `synced_randomized` bucketing strategy.
+    """
+    tarred_dir = loader_config.get("tarred_dir", None)
+    if not tarred_dir:
+        return loader_config
+
+    with open(os.path.join(tarred_dir, SHARDS_METADATA), "r", encoding="utf-8") as f:
+        buckets = json.load(f)["buckets"]
+
+    with open_dict(loader_config):
+        loader_config.pop("tarred_dir")
+        loader_config.is_tarred = True
+        loader_config.shuffle_n = loader_config.get("shuffle_n", 2048)
+        if len(buckets) == 1:
+            loader_config.manifest_filepath = buckets[0]["manifest_filepath"]
+            loader_config.tarred_audio_filepaths = buckets[0]["tarred_audio_filepaths"]
+        else:
+            loader_config.manifest_filepath = [[b["manifest_filepath"]] for b in buckets]
+            loader_config.tarred_audio_filepaths = [[b["tarred_audio_filepaths"]] for b in buckets]
+            loader_config.bucketing_strategy = loader_config.get("bucketing_strategy", "synced_randomized")
+    return loader_config
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a NeMo manifest into tarred audio shards")
+    parser.add_argument("--manifest", required=True, type=str, help="Path to the manifest to pack")
+    parser.add_argument("--output_dir", required=True, type=str, help="Output directory")
+    parser.add_argument("--shard_size_mb", default=512, type=float, help="Target size of each shard in MB")
+    parser.add_argument("--num_buckets", default=1, type=int, help="Number of duration buckets")
+    parser.add_argument(
+        "--shard_multiple", default=1, type=int,
+        help="Round the number of shards of each bucket up to a multiple of this value (e.g. the number of GPUs)"
+    )
+    parser.add_argument("--min_duration", default=0.0, type=float, help="Drop entries shorter than this")
+    parser.add_argument("--max_duration", default=float("inf"), type=float, help="Drop entries longer than this")
+    parser.add_argument("--num_workers", default=None, type=int, help="Number of shards written in parallel")
+    parser.add_argument(
+        "--skip_channel_check", action="store_true",
+        help="Don't convert multi-channel audios to mono before packing them"
+    )
+    args = parser.parse_args()
+
+    if not args.skip_channel_check:
+        # Converted files can't be fixed once they're inside the shards
+        check_and_convert_audio_channels(args.manifest, num_workers=args.num_workers)
+
+    metadata = create_tarred_dataset(
+        args.manifest,
+        args.output_dir,
+        shard_size_mb=args.shard_size_mb,
+        num_buckets=args.num_buckets,
+        shard_multiple=args.shard_multiple,
+        min_duration=args.min_duration,
+        max_duration=args.max_duration,
+        num_workers=args.num_workers,
+    )
+    for bucket in metadata["buckets"]:
+        print(
+            f"{bucket['num_files']} files ({bucket['min_duration']:.2f}s - {bucket['max_duration']:.2f}s) "
+            f"in {bucket['num_shards']} shards: {bucket['tarred_audio_filepaths']}"
+        )
+    print(f"Add `tarred_dir: {args.output_dir}` to a data loader section of the config to train from the shards")
+
+if __name__ == "__main__":
+    main()
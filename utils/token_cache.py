@@ -0,0 +1,260 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+# USAGE: python -m utils.token_cache --config=configs/parakeet-110m-config-v6.yaml --cache_dir="token-cache"
+# or
+#       python -m utils.token_cache --manifest=<paths to manifests, separated by commas> \
+#         --tokenizer_dir="bam-tokenizer/tokenizer_spe_bpe_v1024" \
+#         --cache_dir="token-cache" [--verify]
+#
+# Tokenizes every transcript of the manifests in bulk with a SentencePiece tokenizer and stores the token
+# IDs in one flat array per manifest, indexed by manifest line. The cache records the manifest size/mtime
+# and a digest of `tokenizer.model`, so a stale pairing is detected (`--verify` only checks it). Train
+# from it by adding `token_cache: {enabled: True, dir: <cache_dir>}` to the `training` section of the config.
+from typing import List, Optional
+import argparse
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+import sentencepiece as spm
+import torch
+from omegaconf import DictConfig, OmegaConf
+from .feature_cache import INDEX_FILE, META_FILE, AudioDataset, check_loader_options, store_is_valid
+from .manifest import Manifest
+
+TOKENS_FILE = "tokens.bin"
+
+def _processor_fingerprint(processor: spm.SentencePieceProcessor) -> str:
+    return hashlib.sha1(processor.serialized_model_proto()).hexdigest()
+
+def tokenizer_fingerprint(tokenizer_dir: str) -> str:
+    """Digest of the SentencePiece model of a tokenizer directory, identifying the token IDs it produces."""
+    return _processor_fingerprint(spm.SentencePieceProcessor(model_file=os.path.join(tokenizer_dir, "tokenizer.model")))
+
+def model_tokenizer_fingerprint(model) -> str:
+    """The same digest for the SentencePiece model held by a NeMo model's tokenizer."""
+    processor = getattr(getattr(model, "tokenizer", None), "tokenizer", None)
+    if not isinstance(processor, spm.SentencePieceProcessor):
+        raise ValueError("The token cache needs a SentencePiece tokenizer (tokenizer.type: bpe)")
+    return _processor_fingerprint(processor)
+
+def token_cache_meta(manifest_path: str, tokenizer_dir: str) -> dict:
+    """Metadata pairing a manifest with a tokenizer, used to invalidate the token cache built from them."""
+    st = os.stat(manifest_path)
+    return {
+        "manifest": os.path.abspath(manifest_path),
+        "manifest_size": st.st_size,
+        "manifest_mtime_ns": st.st_mtime_ns,
+        "tokenizer": tokenizer_fingerprint(tokenizer_dir),
+    }
+
+def token_cache_dir(cache_dir: str, meta: dict) -> str:
+    """One cache directory per (manifest, tokenizer) pair."""
+    key = json.dumps([meta["manifest"], meta["tokenizer"]])
+    name = os.path.splitext(os.path.basename(meta["manifest"]))[0]
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:10]}")
+
+def build_token_cache(manifest_path: str, tokenizer_dir: str, cache_dir: str, batch_size: int = 4096) -> str:
+    """
+    Tokenize the transcripts of a manifest and store the IDs, reusing the cache if the pairing is unchanged.
+
+    The IDs of all lines are concatenated in one flat uint16 (int32 for vocabularies above 65535) array and
+    the index holds one (offset, length) row per non-empty manifest line, in file order.
+
+    Returns:
+        str: The directory of the cache.
+    """
+    meta = token_cache_meta(manifest_path, tokenizer_dir)
+    store_dir = token_cache_dir(cache_dir, meta)
+    if store_is_valid(store_dir, meta):
+        print(f"Reusing token cache {store_dir}")
+        return store_dir
+
+    processor = spm.SentencePieceProcessor(model_file=os.path.join(tokenizer_dir, "tokenizer.model"))
+    dtype = np.uint16 if processor.get_piece_size() <= np.iinfo(np.uint16).max + 1 else np.int32
+    os.makedirs(store_dir, exist_ok=True)
+    index, offset = [], 0
+
+    def flush(texts, fout):
+        nonlocal offset
+        for ids in processor.encode(texts, num_threads=-1):
+            fout.write(np.asarray(ids, dtype=dtype).tobytes())
+            index.append((offset, len(ids)))
+            offset += len(ids)
+
+    with open(manifest_path, "r", encoding="utf-8") as fin, open(os.path.join(store_dir, TOKENS_FILE), "wb") as fout:
+        texts = []
+        for line in fin:
+            if line.strip():
+                texts.append(json.loads(line)["text"])
+                if len(texts) == batch_size:
+                    flush(texts, fout)
+                    texts = []
+        if texts:
+            flush(texts, fout)
+
+    np.save(os.path.join(store_dir, INDEX_FILE), np.asarray(index, dtype=np.int64).reshape(-1, 2))
+    with open(os.path.join(store_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({**meta, "dtype": np.dtype(dtype).name, "num_entries": len(index), "num_tokens": offset}, f)
+    return store_dir
+
+class TokenStore:
+    """Read-only, memory-mapped token IDs of a cache written by `build_token_cache`, indexed by manifest line."""
+    def __init__(self, store_dir: str):
+        with open(os.path.join(store_dir, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.store_dir = store_dir
+        self.index = np.load(os.path.join(store_dir, INDEX_FILE))
+        self._tokens = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tokens"] = None
+        return state
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        if self._tokens is None:
+            path = os.path.join(self.store_dir, TOKENS_FILE)
+            # np.memmap refuses empty files
+            self._tokens = np.memmap(path, dtype=self.meta["dtype"], mode="r") if self.meta["num_tokens"] else np.zeros(0)
+        offset, length = self.index[idx]
+        return self._tokens[offset:offset + length]
+
+class TokenCacheDataset(AudioDataset):
+    """
+    Dataset decoding the audios and serving the cached token IDs in the (signal, signal_len, tokens, tokens_len)
+    layout of NeMo's ASR datasets, so the workers never run the tokenizer.
+    """
+    def __init__(self, store_dir: str, loader_config: DictConfig, bos_id: Optional[int] = None, eos_id: Optional[int] = None):
+        manifest = Manifest(loader_config.manifest_filepath)
+        self.store = TokenStore(store_dir)
+        if len(self.store) != len(manifest):
+            raise ValueError(f"Token cache {store_dir} doesn't match {loader_config.manifest_filepath}")
+        manifest = manifest.filter_duration(loader_config.get("min_duration", None), loader_config.get("max_duration", None))
+        super().__init__(manifest, loader_config.sample_rate)
+        self.prefix = [bos_id] if bos_id is not None else []
+        self.suffix = [eos_id] if eos_id is not None else []
+
+    def __getitem__(self, idx):
+        signal = super().__getitem__(idx)
+        tokens = torch.tensor(self.prefix + self.store[self.entries.rows[idx]].tolist() + self.suffix, dtype=torch.long)
+        return signal, torch.tensor(len(signal)), tokens, torch.tensor(len(tokens))
+
+def collate_tokens(batch):
+    signals, signal_lengths, tokens, token_lengths = zip(*batch)
+    signal_lengths = torch.stack(signal_lengths)
+    token_lengths = torch.stack(token_lengths)
+    padded_signals = torch.zeros(len(batch), int(signal_lengths.max()))
+    padded_tokens = torch.zeros(len(batch), max(1, int(token_lengths.max())), dtype=torch.long)
+    for i, (signal, token) in enumerate(zip(signals, tokens)):
+        padded_signals[i, :len(signal)] = signal
+        padded_tokens[i, :len(token)] = token
+    return padded_signals, signal_lengths, padded_tokens, token_lengths
+
+def _special_ids(model, loader_config: DictConfig):
+    """BOS/EOS ids added by NeMo's BPE datasets when `use_start_end_token` is set and the tokenizer has them."""
+    if not loader_config.get("use_start_end_token", True):
+        return None, None
+    tokenizer = model.tokenizer
+    # Same test as NeMo's AudioToBPEDataset: only positive ids are added, a BOS or EOS id of 0 is not
+    bos_id = tokenizer.bos_id if (getattr(tokenizer, "bos_id", None) or 0) > 0 else None
+    eos_id = tokenizer.eos_id if (getattr(tokenizer, "eos_id", None) or 0) > 0 else None
+    return bos_id, eos_id
+
+def setup_token_cache(model, config: DictConfig) -> None:
+    """
+    Build (or reuse) the token caches of the train and valid manifests and replace their data loaders by ones
+    reading the token IDs from the caches.
+
+    Must be called after the model's `setup_*_data` methods, with the tokenizer of `config.tokenizer.path`: the
+    model's own tokenizer is compared with it, since the cache is keyed by that directory's tokenizer.
+    `min_duration`/`max_duration` are applied, loaders setting other dataset options
+    (`feature_cache.UNSUPPORTED_OPTIONS`: tarred or lhotse inputs, silence trimming, augmentation such as speed
+    perturbation...) are rejected.
+    """
+    if config.tokenizer.get("type", None) != "bpe" or getattr(model, "tokenizer", None) is None:
+        raise ValueError("The token cache needs a SentencePiece tokenizer (tokenizer.type: bpe)")
+    if model_tokenizer_fingerprint(model) != tokenizer_fingerprint(config.tokenizer.path):
+        raise ValueError(
+            f"The model's tokenizer differs from tokenizer.path {config.tokenizer.path}, the cached token IDs "
+            f"wouldn't match it (set model.change_vocabulary: True or point tokenizer.path to the model's tokenizer)"
+        )
+
+    cache_config = config.training.token_cache
+    loaders = {
+        "_train_dl": config.data_loaders.train,
+        "_validation_dl": config.data_loaders.valid,
+    }
+    for loader_config in loaders.values():
+        check_loader_options(loader_config, "token_cache")
+
+    for attr, loader_config in loaders.items():
+        store_dir = build_token_cache(loader_config.manifest_filepath, config.tokenizer.path, cache_config.dir)
+        bos_id, eos_id = _special_ids(model, loader_config)
+        setattr(model, attr, torch.utils.data.DataLoader(
+            TokenCacheDataset(store_dir, loader_config, bos_id=bos_id, eos_id=eos_id),
+            batch_size=loader_config.batch_size,
+            shuffle=loader_config.get("shuffle", False),
+            num_workers=loader_config.get("num_workers", 0),
+            pin_memory=loader_config.get("pin_memory", False),
+            collate_fn=collate_tokens,
+        ))
+    print(f"Reading token IDs from {cache_config.dir}")
+
+def verify_token_cache(manifest_path: str, tokenizer_dir: str, cache_dir: str) -> bool:
+    """Whether an up to date token cache exists for this manifest and tokenizer."""
+    meta = token_cache_meta(manifest_path, tokenizer_dir)
+    return store_is_valid(token_cache_dir(cache_dir, meta), meta)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize manifest transcripts once into a token ID cache")
+    parser.add_argument("--config", default=None, type=str, help="Training YAML config to read the tokenizer and manifests from")
+    parser.add_argument("--manifest", default=None, type=str, help="Comma separated list of manifest files")
+    parser.add_argument("--tokenizer_dir", default=None, type=str, help="SentencePiece tokenizer directory")
+    parser.add_argument("--cache_dir", default=None, type=str, help="Cache directory, defaults to training.token_cache.dir")
+    parser.add_argument("--batch_size", default=4096, type=int, help="Number of transcripts tokenized at once")
+    parser.add_argument("--verify", action="store_true", help="Only check that the caches match the manifests and tokenizer")
+    args = parser.parse_args()
+
+    manifests: List[str] = args.manifest.split(",") if args.manifest else []
+    tokenizer_dir, cache_dir = args.tokenizer_dir, args.cache_dir
+    if args.config is not None:
+        config = OmegaConf.load(args.config)
+        manifests = manifests or list(dict.fromkeys(
+            config.data_loaders[name].manifest_filepath for name in ("train", "valid")
+        ))
+        tokenizer_dir = tokenizer_dir or config.tokenizer.get("path", None)
+        cache_dir = cache_dir or OmegaConf.select(config, "training.token_cache.dir")
+    if not manifests or not tokenizer_dir or not cache_dir:
+        parser.error("--manifest, --tokenizer_dir and --cache_dir (or a --config providing them) are required")
+
+    stale = False
+    for manifest in manifests:
+        if args.verify:
+            valid = verify_token_cache(manifest, tokenizer_dir, cache_dir)
+            stale = stale or not valid
+            print(f"{manifest}: {'up to date' if valid else 'missing or stale'}")
+        else:
+            store_dir = build_token_cache(manifest, tokenizer_dir, cache_dir, batch_size=args.batch_size)
+            print(f"{manifest}: {store_dir}")
+    if stale:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Copyright 2025 RobotsMali AI4D Lab.
+
+Licensed under the MIT License; you may not use this file except in compliance with the License.  
+You may obtain a copy of the License at:
+
+https://opensource.org/licenses/MIT
+
+Unless required by applicable law or agreed to in writing, software  
+distributed under the License is distributed on an "AS IS" BASIS,  
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  
+See the License for the specific language governing permissions and  
+limitations under the License.
+"""
+from typing import Dict, List, Optional
+from omegaconf import DictConfig, OmegaConf, open_dict
+from .async_checkpoint import async_checkpoint_plugins, save_model_async
+from .batching import apply_dynamic_batching, uses_dynamic_batching
+from .distributed import init_distributed, is_global_zero, local_device, rank_zero_first, trainer_kwargs
+from .encoder_cache import restore_encoder, setup_encoder_cache
+from .feature_cache import restore_preprocessor, setup_feature_cache
+from .helpers import enable_bn_se
+from .normalize_audio import apply_normalize_audio_config
+from .preflight import PhaseTimer
+from .preprocessing import check_and_convert_audio_channels
+from .safetensors_checkpoint import is_safetensors_checkpoint, load_model as load_safetensors_model
+from .tarred_dataset import apply_tarred_config
+from .token_cache import setup_token_cache
+
+# Character vocabulary of the Bambara CTC models, used when a `char` tokenizer section gives no `labels`
+BAMBARA_LABELS = [
+    '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+    'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k',
+    'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v',
+    'w', 'x', 'y', 'z', ' ', "'", '-', 'ŋ', 'ɔ', 'ɛ', 'ɲ', 'ɓ', 'ɾ',
+]
+
+# Modules whose weights `training.warm_decoder` carries over a vocabulary change: the prediction network and
+# joint of transducers, the CTC decoder of CTC and hybrid models
+DECODERS = ("decoder", "joint", "ctc_decoder")
+
+def load_model(model_config: DictConfig, device=None):
+    """
+    Load the model to fine-tune from the `model` section of the config:
+
+        name: "nvidia/parakeet-tdt_ctc-110m"  # pretrained model name, path to a .nemo file or to a safetensors export
+        class: "ASRModel"                      # class of nemo.collections.asr.models used to load it
+        source: "auto"                         # "pretrained", "restore", "safetensors" or "auto" (from the path)
+
+    Safetensors exports (`python -m utils.safetensors_checkpoint`) are loaded memory-mapped directly on `device`.
+    """
+    import nemo.collections.asr as nemo_asr
+
+    model_class = getattr(nemo_asr.models, model_config.get("class", "ASRModel"))
+    source = model_config.get("source", "auto")
+    if source == "auto":
+        if is_safetensors_checkpoint(str(model_config.name)):
+            source = "safetensors"
+        else:
+            source = "restore" if str(model_config.name).endswith(".nemo") else "pretrained"
+    if source == "restore":
+        return model_class.restore_from(restore_path=model_config.name)
+    if source == "pretrained":
+        return model_class.from_pretrained(model_name=model_config.name)
+    if source == "safetensors":
+        # The generic ASRModel can't be instantiated, the class comes from the export's config then
+        return load_safetensors_model(
+            model_config.name, device=device, model_class=None if model_class is nemo_asr.models.ASRModel else model_class
+        )
+    raise ValueError(f"Unknown model.source {source}, expected pretrained, restore, safetensors or auto")
+
+def prepare_data(config: DictConfig) -> None:
+    """
+    Apply the tarred, normalization and dynamic batching options of each data loader. Files (mono conversions,
+    normalized copies, manifest indexes) are only written by rank 0, the other ranks only rewrite their config.
+    """
+    # The other ranks wait for rank 0 and reuse its outputs
+    with rank_zero_first():
+        for loader_config in (config.data_loaders.train, config.data_loaders.valid, config.data_loaders.test):
+            if loader_config.get('tarred_dir', None):
+                apply_tarred_config(loader_config)
+            elif loader_config.get('normalize_audio', None):
+                # Read mono copies at the target sample rate from a cache directory, the sources are left untouched
+                apply_normalize_audio_config(loader_config, convert=is_global_zero())
+            elif is_global_zero():
+                # Tarred shards are checked when they are created
+                check_and_convert_audio_channels(loader_config.manifest_filepath)
+            # Switch to duration-bucketed batches if the loader has a dynamic_batching section,
+            # the padding report reads the manifest index, built on the first run
+            apply_dynamic_batching(loader_config, report=is_global_zero())
+
+def _set_labels(config: DictConfig, labels: List[str]) -> None:
+    for loader_config in (config.data_loaders.train, config.data_loaders.valid, config.data_loaders.test):
+        with open_dict(loader_config):
+            loader_config.labels = labels
+
+def change_vocabulary(model, config: DictConfig) -> None:
+    """
+    Switch the model to the tokenizer of the config (`tokenizer.type: bpe`) or to its character labels
+    (`tokenizer.type: char`). With `model.change_vocabulary: False`, e.g. to continue a previous run, the model
+    keeps its vocabulary and character models only pass it to the data loaders.
+    """
+    is_char = config.tokenizer.get("type", None) == "char"
+    if not config.model.get("change_vocabulary", True):
+        if is_char:
+            _set_labels(config, list(model.decoder.vocabulary))
+        print("Keeping the vocabulary of the model")
+        return
+    if is_char:
+        labels = list(config.tokenizer.get("labels", None) or BAMBARA_LABELS)
+        model.change_vocabulary(new_vocabulary=labels)
+        _set_labels(config, labels)
+    else:
+        model.change_vocabulary(
+            new_tokenizer_dir=config.tokenizer.path,
+            new_tokenizer_type=config.tokenizer.type
+        )
+
+def save_decoders(model) -> Dict[str, dict]:
+    """Copy the decoder weights, to restore them after a vocabulary change of the same size."""
+    return {
+        name: {k: v.detach().clone() for k, v in getattr(model, name).state_dict().items()}
+        for name in DECODERS if getattr(model, name, None) is not None
+    }
+
+def restore_decoders(model, decoder_states: Dict[str, dict]) -> None:
+    """Load back the saved decoder weights whose shapes all match the current decoders."""
+    for name, state in decoder_states.items():
+        decoder = getattr(model, name)
+        current = decoder.state_dict()
+        if current.keys() != state.keys() or any(current[k].shape != v.shape for k, v in state.items()):
+            print(f"{name} shapes don't match - keeping the new weights")
+            continue
+        decoder.load_state_dict(state)
+        # Ensure the decoder is still in training mode
+        decoder.train()
+        print(f"{name} shapes matched - restored weights from pre-trained model")
+
+def freeze_encoder(model, freeze: bool) -> None:
+    if freeze:
+        model.encoder.freeze()
+        model.encoder.apply(enable_bn_se)
+        print("Model encoder has been frozen")
+    else:
+        model.encoder.unfreeze()
+        print("Model encoder has been unfrozen")
+
+def apply_spec_augment(model, spec_augment: Optional[DictConfig]) -> None:
+    """Override keys of the model's SpecAugment config (`model.spec_augment` section) and rebuild the module."""
+    if not spec_augment:
+        return
+    with open_dict(model.cfg.spec_augment):
+        for key, value in spec_augment.items():
+            model.cfg.spec_augment[key] = value
+    print(model.cfg.spec_augment)
+    model.spec_augmentation = model.from_config_dict(model.cfg.spec_augment)
+
+def apply_loss_weights(model, model_config: DictConfig) -> None:
+    """
+    Set the weight of the auxiliary CTC loss of hybrid TDT/CTC models (`model.aux_ctc_loss_weight`).
+
+    Unlike the former v6 script, which only edited `cfg.aux_ctc.ctc_loss_weight` after the model was built
+    and so kept the checkpoint's weight, the new weight is applied to the loss.
+    """
+    weight = model_config.get("aux_ctc_loss_weight", None)
+    if weight is None:
+        return
+    if not hasattr(model, "ctc_loss_weight"):
+        raise ValueError("model.aux_ctc_loss_weight only applies to hybrid TDT/CTC models")
+    with open_dict(model.cfg):
+        model.cfg.aux_ctc.ctc_loss_weight = weight
+    # Read once by the model's constructor, the config alone doesn't change the loss
+    model.ctc_loss_weight = weight
+    print(f"Auxiliary CTC loss weight set to {weight}")
+
+def _enabled(section: Optional[DictConfig]) -> bool:
+    return section is not None and bool(section.get("enabled", False))
+
+def setup_data(model, config: DictConfig) -> None:
+    """Set up the data loaders, then swap in the feature or token cache loaders if enabled."""
+    model.setup_training_data(train_data_config=config.data_loaders.train)
+    model.setup_validation_data(val_data_config=config.data_loaders.valid)
+    model.setup_test_data(test_data_config=config.data_loaders.test)
+
+    feature_cache = _enabled(config.training.get('feature_cache', None))
+    token_cache = _enabled(config.training.get('token_cache', None))
+    encoder_cache = _enabled(config.training.get('encoder_cache', None))
+    if feature_cache and token_cache:
+        raise ValueError("training.feature_cache and training.token_cache can't be enabled together")
+    if encoder_cache and (feature_cache or token_cache):
+        raise ValueError("training.encoder_cache can't be enabled with training.feature_cache or training.token_cache")
+
+    # Read precomputed log-mel features instead of decoding the audios every epoch
+    if feature_cache:
+        with rank_zero_first():
+            setup_feature_cache(model, config)
+    # Read the transcripts' token IDs from a cache instead of tokenizing them in the data loader workers
+    if token_cache:
+        with rank_zero_first():
+            setup_token_cache(model, config)
+
+def build_trainer(config: DictConfig, dynamic_batching: bool):
+    """The Trainer with W&B logging, checkpointing and early stopping on val_wer and the auto resume policy."""
+    import nemo.lightning as nl
+    from lightning.pytorch.callbacks import ModelCheckpoint
+    from lightning.pytorch.callbacks.early_stopping import EarlyStopping
+    from nemo.lightning import AutoResume
+    from .wandb import MyWandbLogger as WandbLogger
+
+    wandb_logger = WandbLogger(
+        project=config.wandb.project,
+        name=config.wandb.name
+    )
+
+    checkpoint_callback = ModelCheckpoint(
+        dirpath=config.training.checkpoint_dir,
+        save_weights_only=True,
+        save_last=True,
+        monitor="val_wer",
+        mode="min",
+        save_top_k=config.training.save_top_k
+    )
+    # Write the checkpoints in the background from a host memory snapshot instead of blocking training
+    checkpoint_io, stall_logger = async_checkpoint_plugins(config.training)
+
+    early_stopping_callback = EarlyStopping(
+        monitor="val_wer",
+        mode="min",
+        patience=config.training.patience,
+        verbose=True
+    )
+
+    trainer = nl.Trainer(
+        **trainer_kwargs(config.training),
+        precision=config.training.precision,
+        max_epochs=config.training.epochs,
+        accumulate_grad_batches=config.training.accumulate_grad_batches,
+        check_val_every_n_epoch=config.training.check_val_every_n_epoch,
+        logger=wandb_logger,
+        enable_progress_bar=True,
+        callbacks=[checkpoint_callback, early_stopping_callback] + ([stall_logger] if stall_logger else []),
+        plugins=[checkpoint_io] if checkpoint_io else None,
+        # Lhotse samplers shard the data themselves, Lightning must not wrap them in a distributed sampler
+        use_distributed_sampler=not dynamic_batching
+    )
+
+    resume = AutoResume(
+        resume_if_exists=config.training.resume_if_exists,
+        resume_from_directory=config.training.checkpoint_dir,
+        resume_ignore_no_checkpoint=config.training.resume_ignore_no_checkpoint
+    )
+    resume.setup(trainer)
+    return trainer
+
+def train(config: DictConfig, timer: Optional[PhaseTimer] = None) -> None:
+    """
+    Fine-tune an ASR model end to end from a YAML config: every model family (hybrid TDT/CTC, TDT, character
+    CTC), warm start source, vocabulary change, decoder restoration, SpecAugment and loss weight is taken from
+    the config, see `load_model`, `change_vocabulary`, `apply_spec_augment` and `apply_loss_weights`.
+
+    The config is expected to have passed `utils.preflight.preflight`. The time of each phase is added to `timer`.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase("imports"):
+        import wandb
+        import nemo.collections.asr  # noqa: F401, imported here to time it apart from the model loading
+
+    # Join the process group early under torchrun so the data preparation below can be synchronized
+    init_distributed(config.training)
+
+    print(f"Fine tuning {config.model.name}...\nLoading the checkpoint")
+    # Downloaded once by rank 0, the other ranks load it from the cache
+    with timer.phase("model loading"), rank_zero_first():
+        model = load_model(config.model, device=local_device(config.training))
+
+    # Preserve the decoder parameters to restore them after the vocabulary change,
+    # only possible if the new vocab size equals the vocab size of the pretraining dataset
+    warm_decoder = config.training.get("warm_decoder", False) and config.model.get("change_vocabulary", True)
+    decoder_states = save_decoders(model) if warm_decoder else {}
+
+    dynamic_batching = uses_dynamic_batching(config.data_loaders)
+    with timer.phase("data preparation"):
+        prepare_data(config)
+
+    with timer.phase("model setup"):
+        change_vocabulary(model, config)
+        freeze_encoder(model, config.training.freeze_encoder)
+        restore_decoders(model, decoder_states)
+
+        model.setup_optimization(optim_config=config.optim)
+        setup_data(model, config)
+
+        apply_spec_augment(model, config.model.get("spec_augment", None))
+        apply_loss_weights(model, config.model)
+
+        # Train only the decoders from encoder outputs computed once (frozen encoder, no augmentation)
+        if _enabled(config.training.get('encoder_cache', None)):
+            with rank_zero_first():
+                setup_encoder_cache(model, config)
+
+        trainer = build_trainer(config, dynamic_batching)
+
+    # Start training
+    with timer.phase("training"):
+        try:
+            trainer.fit(model)
+        except Exception:
+            print("Training interrupted, finishing logging...")
+            wandb.finish()
+
+    # Save trained model with its original preprocessor and encoder
+    async_save = OmegaConf.select(config.training, "async_checkpoint.enabled", default=False) and \
+        OmegaConf.select(config.training, "async_checkpoint.save_model", default=True)
+    saving = None
+    with timer.phase("saving"):
+        restore_encoder(model, config.data_loaders.test)
+        restore_preprocessor(model, config.data_loaders.test)
+        if trainer.is_global_zero:
+            if async_save:
+                # Packaged while the test set is evaluated, testing doesn't modify the weights
+                saving = save_model_async(model, config.training.save_model_path)
+            else:
+                model.save_to(config.training.save_model_path)
+
+    # Run testing if test set is available
+    if hasattr(model.cfg, 'test_ds') and model.cfg.test_ds.manifest_filepath is not None:
+        with timer.phase("testing"):
+            if model.prepare_test(trainer):
+                trainer.test(model)
+
+    if saving is not None:
+        with timer.phase("saving (wait)"):
+            print(f"Model packaged in the background in {saving.result():.2f}s")
+
+    if trainer.is_global_zero:
+        timer.report()
+
+    print(f"Fine-tuning completed successfully...\nNeMo model saved to: {config.training.save_model_path}")